@@ -0,0 +1,115 @@
+import argparse, asyncio, json, logging, resource, subprocess, sys
+from time import perf_counter
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", 
+                                     description="Runs the scheduler against an in-process mock of the Checkmarx One API.")
+    parser.add_argument("--projects", default="1000", help="Comma separated tenant sizes, e.g. 1000,10000,100000 (default: %(default)s)")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Mean API latency in milliseconds (default: %(default)s)")
+    parser.add_argument("--jitter-ms", type=float, default=5, help="API latency jitter in milliseconds (default: %(default)s)")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of API requests that fail with HTTP 503 (default: %(default)s)")
+    parser.add_argument("--fetch-seconds", type=float, default=5, help="Simulated source fetch time of a scan (default: %(default)s)")
+    parser.add_argument("--change-fraction", type=float, default=0.01, 
+                        help="Fraction of projects changed before the schedule refresh (default: %(default)s)")
+    parser.add_argument("--tagged", type=float, default=0.5, help="Fraction of projects with a schedule tag (default: %(default)s)")
+    parser.add_argument("--grouped", type=float, default=0.2, help="Fraction of projects in a scheduled group (default: %(default)s)")
+    parser.add_argument("--default-schedule", default=None, help="Default schedule policy name (default: none)")
+    parser.add_argument("--skip-submit", action="store_true", help="Do not measure scan submission throughput.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines.")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def run(args, project_count : int) -> dict:
+    from cxone_api import CxOneClient, CxOneAuthEndpoint, CxOneApiEndpoint
+    from logic import Scheduler
+    from utils import GroupSchedules, load_policies
+    from __agent__ import __agent__
+    from .tenant import SyntheticTenant
+    from .mockapi import MockCxOneApi
+    from .fire import fire_all
+
+    tenant = SyntheticTenant(project_count, seed=args.seed, tagged=args.tagged, grouped=args.grouped)
+    api = MockCxOneApi(tenant, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, 
+                       fetch_seconds=args.fetch_seconds, seed=args.seed)
+
+    client = CxOneClient.create_with_oauth("bench", "bench", __agent__, CxOneAuthEndpoint("bench", "bench.invalid"), 
+                                           CxOneApiEndpoint("bench.invalid"))
+    api.attach(client)
+
+    policies = load_policies()
+    group_schedules = GroupSchedules()
+    for index, group in enumerate(tenant.groups):
+        group_schedules.add_schedule(group['path'], policies.parse("daily" if index % 2 == 0 else "hourly"))
+
+    result = {"projects" : project_count, "latency_ms" : args.latency_ms, "error_rate" : args.error_rate}
+
+    start = perf_counter()
+    scheduler = await Scheduler.start(client, args.default_schedule, group_schedules, policies)
+    result['crawl_seconds'] = round(perf_counter() - start, 3)
+    result['scheduled_projects'] = scheduler.scheduled_scans
+
+    tenant.touch(args.change_fraction)
+    start = perf_counter()
+    diff = await scheduler.refresh_schedule()
+    result['refresh_seconds'] = round(perf_counter() - start, 3)
+    result['refresh_diff'] = str(diff)
+
+    if not args.skip_submit:
+        # All jobs firing at the same time is the worst case for submission.
+        start = perf_counter()
+        result['fired_jobs'] = await fire_all(scheduler)
+        elapsed = perf_counter() - start
+        result['submitted_scans'] = api.submitted_scans
+        result['submit_seconds'] = round(elapsed, 3)
+        result['scans_per_second'] = round(api.submitted_scans / elapsed, 2) if elapsed > 0 else 0
+
+    result['api_calls'] = sum(api.calls.values())
+    result['injected_errors'] = api.errors
+    result['unrouted'] = api.unrouted
+    result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return result
+
+
+def print_result(result : dict) -> None:
+    for k, v in result.items():
+        print(f"{k:>20}: {v}")
+    print()
+
+
+def main(argv):
+    args = parse_args(argv)
+    sizes = [int(x) for x in args.projects.split(",") if len(x.strip()) > 0]
+
+    if len(sizes) > 1:
+        # Each size runs in its own process so that peak RSS is measured for that size alone.
+        for size in sizes:
+            child_args = [x for x in argv if not x.startswith("--projects")]
+            if "--projects" in argv:
+                index = argv.index("--projects")
+                child_args = argv[:index] + argv[index + 2:]
+            subprocess.run([sys.executable, "-m", "benchmarks", "--projects", str(size)] + child_args, check=True)
+        return
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    result = asyncio.run(run(args, sizes[0]))
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print_result(result)
+
+    if len(result['unrouted']) > 0:
+        logging.getLogger("benchmarks").warning(f"Requests not handled by the mock API: {result['unrouted']}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
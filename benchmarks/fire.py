@@ -0,0 +1,34 @@
+import asyncio
+from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
+from datetime import datetime, timezone
+
+
+async def fire_all(scheduler) -> int:
+    # Runs every job of a started scheduler now through APScheduler, as if all of their triggers
+    # fired at once, and waits for the scans they start.  Returns the number of jobs fired.
+    aps = scheduler._Scheduler__scheduler
+    jobs = aps.get_jobs()
+    pending = {job.id for job in jobs}
+    finished = asyncio.get_running_loop().create_future()
+
+    def job_done(event):
+        pending.discard(event.job_id)
+        if len(pending) == 0 and not finished.done():
+            finished.set_result(True)
+
+    aps.add_listener(job_done, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+    try:
+        now = datetime.now(timezone.utc)
+        for job in jobs:
+            job.modify(next_run_time=now)
+        if len(pending) > 0:
+            await finished
+    finally:
+        aps.remove_listener(job_done)
+
+    # A trigger dispatch job returns once it has started the scans of its projects.
+    dispatcher = scheduler._Scheduler__dispatcher
+    if dispatcher is not None:
+        await asyncio.gather(*list(dispatcher._TriggerDispatcher__running.values()), return_exceptions=True)
+
+    return len(jobs)
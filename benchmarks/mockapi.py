@@ -0,0 +1,230 @@
+import asyncio, json, random, re, uuid
+from .tenant import SyntheticTenant
+from metrics import endpoint_label
+from requests import Response
+from datetime import datetime, timezone
+from time import monotonic
+from urllib.parse import urlsplit
+from typing import Dict, List, Union
+
+
+class _MockScan:
+
+    def __init__(self, project : Dict, branch : str, tags : Dict):
+        self.id = str(uuid.uuid4())
+        self.project = project
+        self.branch = branch
+        self.tags = tags if tags is not None else {}
+        self.submitted = monotonic()
+        self.created = datetime.now(timezone.utc).isoformat()
+
+    def status(self, queue_seconds : float, fetch_seconds : float) -> str:
+        elapsed = monotonic() - self.submitted
+        if elapsed < queue_seconds:
+            return "Queued"
+        elif elapsed < queue_seconds + (fetch_seconds * 2):
+            return "Running"
+        return "Completed"
+
+    def to_json(self, queue_seconds : float, fetch_seconds : float) -> Dict:
+        return {"id" : self.id, "projectId" : self.project['id'], "projectName" : self.project['name'], "branch" : self.branch, 
+                "status" : self.status(queue_seconds, fetch_seconds), "tags" : self.tags, "createdAt" : self.created, 
+                "updatedAt" : self.created, "sourceType" : "git", "sourceOrigin" : "bench"}
+
+    def workflow(self, queue_seconds : float, fetch_seconds : float) -> List[Dict]:
+        elapsed = monotonic() - self.submitted
+        entries = []
+        if elapsed >= queue_seconds:
+            entries.append({"Source" : "fetch-sources-nv", "Info" : "fetch-sources-nv started", "Timestamp" : self.created})
+        if elapsed >= queue_seconds + fetch_seconds:
+            entries.append({"Source" : "fetch-sources-nv", "Info" : "fetch-sources-nv ended", "Timestamp" : self.created})
+        return entries
+
+
+class MockCxOneApi:
+    # Stands in for the Checkmarx One endpoints used by the scheduler.  Requests are routed by
+    # method and URL path so that the real cxone_api helpers can be used unchanged.
+    __ID = r"([0-9a-fA-F-]{36}|[0-9]+)"
+
+    def __init__(self, tenant : SyntheticTenant, latency_ms : float = 0, jitter_ms : float = 0, error_rate : float = 0, 
+                 queue_seconds : float = 1, fetch_seconds : float = 5, seed : int = 0):
+        self.__tenant = tenant
+        self.__latency = latency_ms / 1000
+        self.__jitter = jitter_ms / 1000
+        self.__error_rate = error_rate
+        self.__queue_seconds = queue_seconds
+        self.__fetch_seconds = fetch_seconds
+        self.__rng = random.Random(seed)
+        self.__scans = {}
+        self.calls = {}
+        self.errors = 0
+        self.unrouted = {}
+        self.__routes = [
+            ("GET", re.compile(r"(?:^|.*/)projects/last-scan$"), self.__last_scan),
+            ("GET", re.compile(rf"(?:^|.*/)projects/{MockCxOneApi.__ID}$"), self.__project),
+            ("GET", re.compile(r"(?:^|.*/)projects/?$"), self.__projects),
+            ("GET", re.compile(r"(?:^|.*/)configuration/(project|tenant|scan)$"), self.__configuration),
+            ("GET", re.compile(rf"(?:^|.*/)repos-manager/.*repo/{MockCxOneApi.__ID}.*"), self.__repo),
+            ("GET", re.compile(rf"(?:^|.*/)scans/{MockCxOneApi.__ID}/workflow$"), self.__workflow),
+            ("GET", re.compile(rf"(?:^|.*/)scans/{MockCxOneApi.__ID}$"), self.__scan),
+            ("GET", re.compile(r"(?:^|.*/)scans/?$"), self.__scan_list),
+            ("POST", re.compile(r"(?:^|.*/)scans/?$"), self.__submit),
+            ("GET", re.compile(rf"(?:^|.*/)groups/{MockCxOneApi.__ID}$"), self.__group),
+            ("GET", re.compile(r"(?:^|.*/)groups.*"), self.__groups),
+        ]
+
+    @property
+    def submitted_scans(self) -> int:
+        return len(self.__scans)
+
+    def attach(self, client) -> None:
+        # Replaces the client's request methods; authentication is never attempted.
+        for method in ["get", "post", "put", "delete"]:
+            setattr(client, method, self.__bind(method.upper()))
+
+    def __bind(self, method : str):
+        async def request(url, *args, **kwargs):
+            return await self.__request(method, url, **kwargs)
+        return request
+
+    @staticmethod
+    def __response(status : int, body : Union[Dict, List, None] = None) -> Response:
+        response = Response()
+        response.status_code = status
+        response.headers['Content-Type'] = "application/json"
+        response._content = json.dumps(body if body is not None else {}).encode()
+        return response
+
+    @staticmethod
+    def __params(kwargs : Dict) -> Dict:
+        # Parameter names may be passed with dashes or underscores; list values may be joined with commas.
+        params = {}
+        for k, v in (kwargs.get("params", None) or {}).items():
+            if v is None:
+                continue
+            params[k.replace("-", "_")] = v.split(",") if isinstance(v, str) and "," in v else v
+        return params
+
+    @staticmethod
+    def __as_list(value) -> List[str]:
+        return [str(x) for x in value] if isinstance(value, (list, tuple, set)) else [str(value)]
+
+    @staticmethod
+    def __page(params : Dict, values : List, total : int, element : str) -> Response:
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 20))
+        return MockCxOneApi.__response(200, {"totalCount" : total, "filteredTotalCount" : len(values), element : values[offset:offset + limit]})
+
+    async def __request(self, method : str, url, **kwargs) -> Response:
+        path = urlsplit(str(url)).path
+        label = f"{method} {endpoint_label(url)}"
+        self.calls[label] = self.calls.get(label, 0) + 1
+
+        delay = self.__latency + (self.__rng.uniform(-self.__jitter, self.__jitter) if self.__jitter > 0 else 0)
+        await asyncio.sleep(max(0, delay))
+
+        if self.__error_rate > 0 and self.__rng.random() < self.__error_rate:
+            self.errors += 1
+            return MockCxOneApi.__response(503, {"message" : "injected error"})
+
+        for route_method, pattern, handler in self.__routes:
+            if route_method == method:
+                match = pattern.match(path)
+                if match is not None:
+                    return handler(MockCxOneApi.__params(kwargs), kwargs, *match.groups())
+
+        self.unrouted[label] = self.unrouted.get(label, 0) + 1
+        return MockCxOneApi.__response(404, {"message" : "not found"})
+
+    def __projects(self, params : Dict, kwargs : Dict) -> Response:
+        values = self.__tenant.projects.values()
+        if "ids" in params.keys():
+            ids = set(MockCxOneApi.__as_list(params['ids']))
+            values = [p for p in values if p['id'] in ids]
+        if "groups" in params.keys():
+            groups = set(MockCxOneApi.__as_list(params['groups']))
+            values = [p for p in values if len(groups.intersection(p['groups'])) > 0]
+        if "tags_keys" in params.keys():
+            keys = MockCxOneApi.__as_list(params['tags_keys'])
+            values = [p for p in values if any([k in p['tags'].keys() for k in keys])]
+        values = list(values)
+        return MockCxOneApi.__page(params, values, len(self.__tenant.projects), "projects")
+
+    def __project(self, params : Dict, kwargs : Dict, project_id : str) -> Response:
+        project = self.__tenant.projects.get(project_id, None)
+        return MockCxOneApi.__response(200, project) if project is not None else MockCxOneApi.__response(404)
+
+    def __configuration(self, params : Dict, kwargs : Dict, _ : str) -> Response:
+        return MockCxOneApi.__response(200, [])
+
+    def __repo(self, params : Dict, kwargs : Dict, repo_id : str) -> Response:
+        for project in self.__tenant.projects.values():
+            if str(project['repoId']) == repo_id:
+                return MockCxOneApi.__response(200, {"id" : project['repoId'], "url" : project['repoUrl'], "isRepoAdmin" : True,
+                                                     "branches" : [{"name" : project['mainBranch'], "isDefaultBranch" : True}],
+                                                     "sastScannerEnabled" : True, "scaScannerEnabled" : True, "kicsScannerEnabled" : True,
+                                                     "apiSecScannerEnabled" : False, "containerScannerEnabled" : False, 
+                                                     "ossfSecoreCardScannerEnabled" : False, "secretsDerectionScannerEnabled" : False})
+        return MockCxOneApi.__response(404)
+
+    def __last_scan(self, params : Dict, kwargs : Dict) -> Response:
+        project_ids = set(MockCxOneApi.__as_list(params.get("project_ids", [])))
+        statuses = MockCxOneApi.__as_list(params['scan_status']) if "scan_status" in params.keys() else None
+        result = {}
+        for scan in self.__scans.values():
+            if (len(project_ids) == 0 or scan.project['id'] in project_ids) and \
+                (statuses is None or scan.status(self.__queue_seconds, self.__fetch_seconds) in statuses):
+                result[scan.project['id']] = scan.to_json(self.__queue_seconds, self.__fetch_seconds)
+        return MockCxOneApi.__response(200, result)
+
+    def __scan(self, params : Dict, kwargs : Dict, scan_id : str) -> Response:
+        scan = self.__scans.get(scan_id, None)
+        return MockCxOneApi.__response(200, scan.to_json(self.__queue_seconds, self.__fetch_seconds)) \
+            if scan is not None else MockCxOneApi.__response(404)
+
+    def __scan_list(self, params : Dict, kwargs : Dict) -> Response:
+        scans = [s.to_json(self.__queue_seconds, self.__fetch_seconds) for s in self.__scans.values()]
+        if "scan_ids" in params.keys():
+            ids = set(MockCxOneApi.__as_list(params['scan_ids']))
+            scans = [s for s in scans if s['id'] in ids]
+        if "project_ids" in params.keys() or "project_id" in params.keys():
+            ids = set(MockCxOneApi.__as_list(params.get("project_ids", params.get("project_id", None))))
+            scans = [s for s in scans if s['projectId'] in ids]
+        if "statuses" in params.keys():
+            statuses = MockCxOneApi.__as_list(params['statuses'])
+            scans = [s for s in scans if s['status'] in statuses]
+        if "branch" in params.keys():
+            scans = [s for s in scans if s['branch'] == params['branch']]
+        if "tags_keys" in params.keys():
+            keys = MockCxOneApi.__as_list(params['tags_keys'])
+            scans = [s for s in scans if any([k in s['tags'].keys() for k in keys])]
+        return MockCxOneApi.__page(params, scans, len(self.__scans), "scans")
+
+    def __workflow(self, params : Dict, kwargs : Dict, scan_id : str) -> Response:
+        scan = self.__scans.get(scan_id, None)
+        return MockCxOneApi.__response(200, scan.workflow(self.__queue_seconds, self.__fetch_seconds)) \
+            if scan is not None else MockCxOneApi.__response(404)
+
+    def __submit(self, params : Dict, kwargs : Dict) -> Response:
+        body = kwargs.get("json", None) or {}
+        project = self.__tenant.projects.get(body.get("project", {}).get("id", None), None)
+        if project is None:
+            return MockCxOneApi.__response(400, {"message" : "project not found"})
+
+        handler = body.get("handler", {})
+        scan = _MockScan(project, handler.get("branch", project['mainBranch']), body.get("tags", None))
+        self.__scans[scan.id] = scan
+        return MockCxOneApi.__response(201, scan.to_json(self.__queue_seconds, self.__fetch_seconds))
+
+    def __group(self, params : Dict, kwargs : Dict, group_id : str) -> Response:
+        for group in self.__tenant.groups:
+            if group['id'] == group_id:
+                return MockCxOneApi.__response(200, group)
+        return MockCxOneApi.__response(404)
+
+    def __groups(self, params : Dict, kwargs : Dict) -> Response:
+        groups = self.__tenant.groups
+        search = params.get("search", params.get("name", params.get("path", None)))
+        if search is not None:
+            groups = [g for g in groups if str(search).strip("/").split("/")[-1] in g['name']]
+        return MockCxOneApi.__response(200, [g | {"subGroups" : []} for g in groups])
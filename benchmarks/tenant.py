@@ -0,0 +1,55 @@
+import random, uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+
+class SyntheticTenant:
+    # Tagged projects use these schedule tag values; they must resolve with the built-in policies.
+    TAG_VALUES = ["daily", "hourly", "daily:develop", "hourly::sast"]
+
+    def __init__(self, project_count : int, seed : int = 0, tagged : float = 0.5, grouped : float = 0.2, 
+                 imported : float = 0.1, group_count : int = 10, host_count : int = 4):
+        self.__rng = random.Random(seed)
+        self.__updated = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.groups = [{"id" : str(self.__uuid()), "name" : f"bench{x}", "path" : f"/bench/bench{x}"} for x in range(group_count)]
+        self.projects = {}
+
+        for index in range(project_count):
+            project = self.__project(index, tagged, grouped, imported, host_count)
+            self.projects[project['id']] = project
+
+    def __uuid(self) -> uuid.UUID:
+        return uuid.UUID(int=self.__rng.getrandbits(128), version=4)
+
+    def __project(self, index : int, tagged : float, grouped : float, imported : float, host_count : int) -> Dict:
+        is_imported = self.__rng.random() < imported
+        project_id = str(self.__uuid())
+        repo_url = f"https://scm{index % host_count}.bench.invalid/org{index % 50}/repo{index}.git"
+
+        return {
+            "id" : project_id,
+            "name" : f"bench-project-{index}",
+            "tags" : {"schedule" : self.__rng.choice(SyntheticTenant.TAG_VALUES)} if self.__rng.random() < tagged else {},
+            "groups" : [self.__rng.choice(self.groups)['id']] if len(self.groups) > 0 and self.__rng.random() < grouped else [],
+            "repoUrl" : repo_url,
+            "mainBranch" : "main",
+            "origin" : "GitHub" if is_imported else "UI",
+            "repoId" : index + 1 if is_imported else None,
+            "criticality" : 3,
+            "createdAt" : self.__updated.isoformat(),
+            "updatedAt" : self.__updated.isoformat(),
+        }
+
+    def touch(self, fraction : float) -> List[str]:
+        # Simulates changes between schedule updates: some projects change their schedule tag,
+        # some have unrelated updates.
+        changed = self.__rng.sample(list(self.projects.keys()), int(len(self.projects) * fraction))
+        self.__updated += timedelta(hours=1)
+
+        for project_id in changed:
+            project = self.projects[project_id]
+            project['updatedAt'] = self.__updated.isoformat()
+            if self.__rng.random() < 0.5:
+                project['tags'] = {"schedule" : self.__rng.choice(SyntheticTenant.TAG_VALUES)}
+
+        return changed
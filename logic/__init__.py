@@ -1,21 +1,61 @@
-import logging, utils, asyncio
-from scan import ScanExecutor
+import logging, utils, asyncio, json, hashlib, metrics
+from scan import (ScanExecutor, 
+                  SubmissionRateLimiter, 
+                  PreFireChecks, 
+                  FetchThrottleMonitor, 
+                  AdaptiveConcurrency, 
+                  HostConcurrency, 
+                  PrioritySlots, 
+                  SubmissionPriority,
+                  RepoConfigCache,
+                  RecentScanIndex)
+from .snapshot import ScheduleSnapshot
+from .diff import ScheduleDiff
+from .dispatch import TriggerDispatcher
+from .crawl import CrawlPlanner
+from metrics import profiling
 from cxone_api.util import page_generator
 from cxone_api.high.projects import ProjectRepoConfig
 from cxone_api.high.access_mgmt.user_mgmt import Groups
 from cxone_api.low.projects import retrieve_list_of_projects
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES
 from utils import (normalize_repo_enabled_engines, 
                    get_threads_config, 
-                   ProjectSchedule)
-from time import perf_counter_ns
+                   get_crawl_concurrency_config,
+                   get_incremental_refresh,
+                   get_crawl_page_size_config,
+                   get_crawl_page_concurrency_config,
+                   get_full_refresh_seconds_config,
+                   get_snapshot_path,
+                   get_submit_rate_config,
+                   get_submit_burst_config,
+                   get_batch_prefire_checks,
+                   get_fetch_throttle,
+                   get_fetch_poll_seconds_config,
+                   get_adaptive_threads,
+                   get_adaptive_fetch_target_config,
+                   get_adaptive_max_queued_config,
+                   load_scm_host_limits,
+                   get_scm_default_limit_config,
+                   get_dispatch_by_trigger,
+                   load_shard_assignment,
+                   get_repo_cache_seconds_config,
+                   get_repo_cache_size_config,
+                   get_recent_scan_hours_config,
+                   get_bulk_recent_scans,
+                   get_recent_scan_refresh_seconds_config,
+                   ProjectSchedule,
+                   PolicyRegistry)
+from time import perf_counter_ns, monotonic
 from datetime import timedelta
+from typing import List, Set, Tuple
 
 
 class Scheduler:
     
     __log = logging.getLogger("Scheduler")
+    __REFRESH_BATCH_SIZE = 100
 
     async def __get_schedule_entry_from_tag(self, project_data, schedule_tag_value, bad_cb):
         if schedule_tag_value is None or len(schedule_tag_value) == 0:
@@ -33,7 +73,7 @@ class Scheduler:
         elements = schedule_tag_value.split(":")
 
         if len(elements) > 0:
-            ss = utils.ScheduleString(elements.pop(0), self.__policies)
+            ss = self.__policies.parse(elements.pop(0))
 
             if ss.is_valid():
                 branch = elements.pop(0) if len(elements) > 0 else ''
@@ -67,6 +107,7 @@ class Scheduler:
                     return None
 
                 if repo_url is not None and branch is not None:
+                    self.__cache_repo_config(project_data['id'], repo_details)
                     return {project_data['id'] : [utils.ProjectSchedule(project_data['id'], ss, branch, engines, await repo_details.repo_url)]}
             else:
                 Scheduler.__log.error(f"Project {project_data['id']}:{project_data['name']} has invalid schedule tag {schedule_tag_value}, skipping.")
@@ -76,30 +117,31 @@ class Scheduler:
         return None
 
 
-    async def __get_schedule_entry_no_tag(self, bad_cb, group_index, project_json):
+    async def __get_schedule_entry_no_tag(self, bad_cb, group_crontabs, project_json):
         project_schedules = []
 
+        # If the project matches a group, assign it the schedule for all matching groups.
+        group_matches = [group_crontabs[gid] for gid in project_json['groups'] if gid in group_crontabs.keys()]
+
+        if len(group_matches) == 0 and self.__default_schedule is None:
+            return None
+
         # Check that repo is defined and primary branch is defined
         repo_cfg = await ProjectRepoConfig.from_project_json(self.__client, project_json)
         if (await repo_cfg.repo_url is not None) and (await repo_cfg.primary_branch is not None):
-            # If the project matches a group, assign it the schedule for all matching groups.
-            for gid in project_json['groups']:
-                g_desc = await group_index.get_by_id(gid)
-
-                if g_desc is not None:
-                    ss = self.__group_schedules.get_schedule(str(g_desc.path))
-                
-                    if ss is not None:
-                        project_schedules.append(utils.ProjectSchedule(project_json['id'], ss, 
-                            await repo_cfg.primary_branch, 
-                            utils.normalize_selected_engines_from_tag('all', await repo_cfg.is_scm_imported), 
-                            await repo_cfg.repo_url))
+            for ss in group_matches:
+                project_schedules.append(utils.ProjectSchedule(project_json['id'], ss, 
+                    await repo_cfg.primary_branch, 
+                    utils.normalize_selected_engines_from_tag('all', await repo_cfg.is_scm_imported), 
+                    await repo_cfg.repo_url))
 
             if len(project_schedules) > 0:
+                self.__cache_repo_config(project_json['id'], repo_cfg)
                 return {project_json['id'] : project_schedules}
             elif self.__default_schedule is not None:
-                ss = utils.ScheduleString(self.__default_schedule, self.__policies)
+                ss = self.__policies.parse(self.__default_schedule)
                 if ss.is_valid():
+                    self.__cache_repo_config(project_json['id'], repo_cfg)
                     return {project_json['id'] : [utils.ProjectSchedule(project_json['id'], 
                         ss.get_crontab_schedule(), 
                         await repo_cfg.primary_branch, 
@@ -109,123 +151,400 @@ class Scheduler:
             if self.__default_schedule is not None and bad_cb is not None:
                 bad_cb(project_json['id'], f"Project [{project_json['name']}] has a misconfigured repo url or primary branch.")
 
-    async def __get_changed_projects(self, new_schedule):
-        check_projects = set(new_schedule.keys()) & set(self.__the_schedule.keys())
+    def __cache_repo_config(self, project_id, repo_config):
+        if self.__repo_cache is not None:
+            self.__repo_cache.put(project_id, repo_config)
 
-        result = {}
-        for k in check_projects:
-            if not len(new_schedule[k]) == len(self.__the_schedule[k]):
-                result[k] = new_schedule[k]
-            else:
-                new_schedule_comps = set([str(x) for x in new_schedule[k]])
-                old_schedule_comps = set([str(x) for x in self.__the_schedule[k]])
-                if len(new_schedule_comps - old_schedule_comps) > 0:
-                    result[k] = new_schedule[k]
+    async def __load_group_crontabs(self):
+        if self.__group_schedules.empty:
+            return {}
 
-        return result
+        prefetch_start = perf_counter_ns()
+        group_index = Groups(self.__client)
+        group_crontabs = {}
+
+        for path in self.__group_schedules.groups:
+            g_desc = await group_index.get_by_path(path)
+            if g_desc is None:
+                Scheduler.__log.warning(f"Group [{path}] has a schedule but was not found.")
+                continue
+
+            group_crontabs[g_desc.id] = self.__group_schedules.get_schedule(path)
+
+        Scheduler.__log.info(f"Group prefetch loaded {len(group_crontabs.keys())} of {len(self.__group_schedules.groups)} scheduled groups in " + 
+                             f"{timedelta(microseconds=(perf_counter_ns() - prefetch_start)/1000)}")
+
+        return group_crontabs
+
+    async def refresh_schedule(self) -> ScheduleDiff:
+        # The warm-start reconciliation and the periodic update may overlap.
+        async with self.__refresh_lock:
+            with profiling.phase("refresh_schedule"):
+                return await self.__refresh_schedule()
+
+    async def refresh_projects(self, project_ids : List[str]) -> ScheduleDiff:
+        # Resolves only the given projects and applies the changes without a crawl of the tenant.  This
+        # does not wait for a full refresh that is running; that refresh resolves these projects again
+        # before it applies its results.
+        with profiling.phase("refresh_projects"):
+            return await self.__refresh_projects(set(project_ids))
+
+    async def __resolve_projects(self, project_ids : Set[str]) -> Tuple[Set[str], dict]:
+        if self.__group_crontabs is None:
+            self.__set_group_crontabs(await self.__load_group_crontabs())
+
+        if self.__shards is not None:
+            project_ids = {pid for pid in project_ids if self.__shards.owns(pid)}
+
+        requested = sorted(project_ids)
+        resolved = {}
+        for index in range(0, len(requested), Scheduler.__REFRESH_BATCH_SIZE):
+            async for project in page_generator(retrieve_list_of_projects, "projects", client=self.__client, 
+                                                limit=Scheduler.__REFRESH_BATCH_SIZE, 
+                                                ids=requested[index:index + Scheduler.__REFRESH_BATCH_SIZE]):
+                if project['id'] not in project_ids:
+                    continue
+
+                if self.__repo_cache is not None:
+                    self.__repo_cache.invalidate(project['id'])
+
+                entry = await self.__resolve_project_uncached(project, None, self.__group_crontabs)
+                if get_incremental_refresh():
+                    self.__resolution_cache[project['id']] = (self.__project_fingerprint(project), monotonic(), entry)
+                if entry is not None:
+                    resolved.update(entry)
 
-    async def refresh_schedule(self):
-        new_schedule = await self.__load_schedule()
+        # Requested projects that were not found are no longer visible and are removed.
+        for pid in project_ids - resolved.keys():
+            self.__resolution_cache.pop(pid, None)
 
-        # Schedules that are in new_schedule but not in the current schedule are new
-        # and can be written immediately.
-        new_scheduled_projects = set(new_schedule.keys()) - set(self.__the_schedule.keys())
-        new_schedules = {k:new_schedule[k] for k in new_scheduled_projects}
+        return project_ids, resolved
+
+    async def __refresh_projects(self, project_ids : Set[str]) -> ScheduleDiff:
+        project_ids, resolved = await self.__resolve_projects(project_ids)
+
+        async with self.__apply_lock:
+            if self.__crawling:
+                self.__touched.update(project_ids)
+
+            diff = ScheduleDiff({pid : self.__the_schedule[pid] for pid in project_ids if pid in self.__the_schedule.keys()}, resolved)
+            self.__apply_diff(diff)
+
+            for pid in project_ids:
+                if pid in resolved.keys():
+                    self.__the_schedule[pid] = resolved[pid]
+                else:
+                    self.__the_schedule.pop(pid, None)
+
+            await self.__save_snapshot()
+
+        return diff
+
+    async def __refresh_schedule(self) -> ScheduleDiff:
+        self.__touched = set()
+        self.__crawling = True
+        try:
+            new_schedule = await self.__load_schedule()
 
-        for sched_list in new_schedules.values():
+            # Projects refreshed individually during the crawl may have changed after the crawl resolved them.
+            touched, self.__touched = self.__touched, set()
+            if len(touched) > 0:
+                touched, resolved = await self.__resolve_projects(touched)
+                for pid in touched:
+                    new_schedule.pop(pid, None)
+                new_schedule.update(resolved)
+
+            async with self.__apply_lock:
+                self.__crawling = False
+
+                # Projects refreshed while the above were resolved again are already current.
+                for pid in self.__touched:
+                    if pid in self.__the_schedule.keys():
+                        new_schedule[pid] = self.__the_schedule[pid]
+                    else:
+                        new_schedule.pop(pid, None)
+
+                diff = ScheduleDiff(self.__the_schedule, new_schedule)
+                self.__apply_diff(diff)
+                self.__the_schedule = new_schedule
+
+                await self.__save_snapshot()
+        finally:
+            self.__crawling = False
+
+        return diff
+
+    def __apply_diff(self, diff : ScheduleDiff) -> None:
+        # Schedules for projects that are not in the current schedule are new
+        # and can be written immediately.
+        self.__log.debug(f"Detected {len(diff.new)} new project schedules")
+        for sched_list in diff.new.values():
             for new_sched in sched_list:
                 self.__add_job(new_sched)
 
-        self.__log.debug(f"Detected {len(new_scheduled_projects)} new project schedules")
-        
-        # Schedules that are in the current schedule but not in the new schedule can
-        # be removed.
-        removed_projects = set(self.__the_schedule.keys()) - set(new_schedule.keys())
-
-        self.__log.debug(f"Deleting {len(removed_projects)} project schedules")
-        for removed in removed_projects:
-            if removed in self.__job_cache.keys():
-                for job in self.__job_cache[removed]:
+        # Schedules for projects that are no longer scheduled can be removed.
+        self.__log.debug(f"Deleting {len(diff.removed)} project schedules")
+        for removed, scheds in diff.removed.items():
+            if self.__dispatcher is not None:
+                self.__dispatcher.remove_project(removed, scheds)
+            else:
+                for _, job in self.__job_cache.pop(removed, []):
                     job.remove()
-                del self.__job_cache[removed]
+            self.__priority.forget(removed)
+            if self.__repo_cache is not None:
+                self.__repo_cache.invalidate(removed)
 
-            self.__the_schedule.pop(removed, None)
+        # Projects that are still scheduled only rewrite the jobs that changed.  A change
+        # that keeps the trigger only needs the job's arguments updated.
+        self.__log.debug(f"Changing {len(diff.changed)} project schedules")
+        for change in diff.changed.values():
+            for old_sched in change.removed:
+                self.__remove_job(old_sched)
 
-        # Schedules that still exist should be checked for changes.  Any changed
-        # schedules need to be re-written.
-        changed_schedule = await self.__get_changed_projects(new_schedule)
-        self.__log.debug(f"Changing {len(changed_schedule)} project schedules")
-        for k in changed_schedule.keys():
-            self.__the_schedule.pop(k, None)
-            self.__the_schedule[k] = changed_schedule[k]
+            for old_sched, new_sched in change.modified:
+                self.__modify_job(old_sched, new_sched)
 
-            if k in self.__job_cache.keys():
-                for job in self.__job_cache[k]:
-                    job.remove()
-                del self.__job_cache[k]
-            
-            for sched in self.__the_schedule[k]:
-                self.__add_job(sched)
+            for new_sched in change.added:
+                self.__add_job(new_sched)
+
+    def __set_group_crontabs(self, group_crontabs):
+        self.__group_crontabs = group_crontabs
+        # Resolution also depends on the scheduled groups and the default schedule; when either changes,
+        # every cached resolution is stale.
+        self.__resolution_context = hashlib.sha256(json.dumps({'groups' : group_crontabs, 'default' : self.__default_schedule}, 
+                                                              sort_keys=True, default=str).encode()).hexdigest()
+
+    def __project_fingerprint(self, project):
+        # Anything that feeds schedule resolution; a change in any of these means the project must be
+        # resolved again.
+        return json.dumps({k : project.get(k, None) for k in ['updatedAt', 'tags', 'groups', 'repoUrl', 'mainBranch', 'origin', 'repoId']} | 
+                          {'context' : self.__resolution_context}, sort_keys=True, default=str)
+
+    async def __resolve_project_uncached(self, project, bad_cb, group_crontabs):
+        if "schedule" in project['tags'].keys():
+            entry = await self.__get_schedule_entry_from_tag(project, project['tags']['schedule'], bad_cb)
+            if entry is None:
+                Scheduler.__log.debug(f"NO SCHEDULE ENTRY: {project}")
+            return entry
+        else:
+            return await self.__get_schedule_entry_no_tag(bad_cb, group_crontabs, project)
+
+    async def __resolve_project(self, project, bad_cb, group_crontabs, stats):
+        if not get_incremental_refresh():
+            return await self.__resolve_project_uncached(project, bad_cb, group_crontabs)
+
+        fingerprint = self.__project_fingerprint(project)
+        cached = self.__resolution_cache.get(project['id'], None)
+
+        if cached is not None:
+            cached_fingerprint, resolved_at, cached_entry = cached
+            if cached_fingerprint == fingerprint and (monotonic() - resolved_at) < get_full_refresh_seconds_config():
+                stats['reused'] += 1
+                return cached_entry
+
+        if self.__repo_cache is not None:
+            self.__repo_cache.invalidate(project['id'])
+
+        entry = await self.__resolve_project_uncached(project, bad_cb, group_crontabs)
+        self.__resolution_cache[project['id']] = (fingerprint, monotonic(), entry)
+        stats['resolved'] += 1
+        return entry
 
+    async def __save_snapshot(self):
+        if get_snapshot_path() is not None:
+            await ScheduleSnapshot.save(get_snapshot_path(), self.__the_schedule)
 
-        self.__the_schedule = self.__the_schedule | new_schedules
+    async def __load_snapshot(self):
+        if get_snapshot_path() is None:
+            return None
+
+        snapshot = await ScheduleSnapshot.load(get_snapshot_path())
+        if snapshot is None:
+            return None
+
+        # Policies may have changed since the snapshot was written; the reconciliation crawl
+        # will pick these projects up again if they are still scheduled.
+        result = {}
+        for pid, entries in snapshot.items():
+            if self.__shards is not None and not self.__shards.owns(pid):
+                continue
 
-        return len(new_scheduled_projects), len(removed_projects), len(changed_schedule.keys())
+            valid = [x for x in entries if self.__policies.has_crontab(x.schedule)]
+            if len(valid) > 0:
+                result[pid] = valid
+            else:
+                Scheduler.__log.debug(f"Snapshot entry for project {pid} has no valid schedule, skipping.")
+
+        return result
+
+    async def __reconcile(self):
+        try:
+            diff = await self.refresh_schedule()
+            Scheduler.__log.info(f"Snapshot reconciled: {diff}")
+        except Exception as ex:
+            Scheduler.__log.error("Snapshot reconciliation failed, the schedule will be reconciled at the next update.")
+            Scheduler.__log.exception(ex)
 
     @property
     def scheduled_scans(self):
         return len(self.__the_schedule.keys())
+
+    @property
+    def ready(self):
+        return self.__ready
+
+    @property
+    def startup_progress(self):
+        # Jobs are registered as the initial crawl resolves projects, so scans can fire before it completes.
+        return {"ready" : self.__ready, 
+                "source" : self.__startup_source, 
+                "projects_crawled" : self.__crawled, 
+                "projects_scheduled" : self.scheduled_scans, 
+                "elapsed_seconds" : round(monotonic() - self.__started_at, 3)}
+
+    @property
+    def scheduled_projects(self):
+        return list(self.__the_schedule.keys())
+
+    @property
+    def submission_queue_depth(self):
+        return self.__threads.depth
+
+    @property
+    def submission_queue_oldest_seconds(self):
+        return self.__threads.oldest_wait_seconds
+
+    @property
+    def effective_threads(self):
+        return self.__adaptive.limit if self.__adaptive is not None else get_threads_config()
         
 
-    async def __load_schedule(self, bad_cb = None):
+    async def __load_schedule(self, bad_cb = None, entry_cb = None):
+        with profiling.profile("crawl"), profiling.phase("load_schedule"):
+            return await self.__crawl_schedule(bad_cb, entry_cb)
+
+    async def __crawl_schedule(self, bad_cb, entry_cb):
         load_start = perf_counter_ns()
         Scheduler.__log.debug("Begin: Load project schedule")
+        metrics.CRAWLS.inc()
 
         schedule = {}
+        self.__crawled = 0
         
-        group_index = Groups(self.__client)
+        group_crontabs = await self.__load_group_crontabs()
+        self.__set_group_crontabs(group_crontabs)
 
-        if not self.__group_schedules.empty or self.__default_schedule is not None:
-            tag_args = {}
-        else:
-            tag_args = {'tags_keys' : 'schedule'}
+        planner = CrawlPlanner(self.__default_schedule, list(group_crontabs.keys()))
 
-        async for project in page_generator(retrieve_list_of_projects, "projects", client=self.__client, limit=100, **tag_args):
-            if "schedule" in project['tags'].keys():
-                entry = await self.__get_schedule_entry_from_tag(project, project['tags']['schedule'], bad_cb)
-                if entry is not None:
-                    schedule.update(entry)
-                else:
-                    Scheduler.__log.debug(f"NO SCHEDULE ENTRY: {project}")
-            else:
-                entry = await self.__get_schedule_entry_no_tag(bad_cb, group_index, project)
+        concurrency = get_crawl_concurrency_config()
+        pending = set()
+        seen = set()
+        stats = {'reused' : 0, 'resolved' : 0}
+
+        def collect(done):
+            for task in done:
+                entry = task.result()
                 if entry is not None:
                     schedule.update(entry)
+                    if entry_cb is not None:
+                        entry_cb(entry)
+
+        try:
+            async for project in planner.projects(self.__client, get_crawl_page_size_config(), get_crawl_page_concurrency_config()):
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    collect(done)
+
+                if self.__shards is not None and not self.__shards.owns(project['id']):
+                    continue
+
+                seen.add(project['id'])
+                self.__crawled = len(seen)
+                pending.add(asyncio.create_task(self.__resolve_project(project, bad_cb, group_crontabs, stats)))
+
+            if len(pending) > 0:
+                done, pending = await asyncio.wait(pending)
+                collect(done)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if get_incremental_refresh():
+            # Projects that were not seen in this crawl no longer exist, are no longer visible, or moved to another shard.
+            for pid in set(self.__resolution_cache.keys()) - seen:
+                del self.__resolution_cache[pid]
+            Scheduler.__log.debug(f"Incremental load: {stats['resolved']} projects resolved, {stats['reused']} projects unchanged")
+
+        load_seconds = (perf_counter_ns() - load_start) / 1e9
+        metrics.CRAWL_SECONDS.set(load_seconds)
+        metrics.CRAWL_PROJECTS.set(len(seen))
+        metrics.CRAWL_RATE.set(len(seen) / load_seconds if load_seconds > 0 else 0)
 
         Scheduler.__log.debug("End: Load project schedule")
-        Scheduler.__log.info(f"Schedule load time: {timedelta(microseconds=(perf_counter_ns() - load_start)/1000)}")
+        Scheduler.__log.info(f"Schedule load time: {timedelta(seconds=load_seconds)}")
 
         return schedule
 
 
     @staticmethod
-    async def __initialize(client, default_schedule, group_schedules, policies):
+    async def __initialize(client, default_schedule, group_schedules, policies, sharded = True):
         ret_sched = Scheduler()
         ret_sched.__client = client
+        ret_sched.__shards = load_shard_assignment() if sharded else None
+        if ret_sched.__shards is not None:
+            Scheduler.__log.info(f"Scheduling projects for shard {ret_sched.__shards}")
         ret_sched.__group_schedules = group_schedules
-        ret_sched.__policies = policies
+        ret_sched.__policies = policies if isinstance(policies, PolicyRegistry) else PolicyRegistry(policies)
         ret_sched.__default_schedule = None
-        ret_sched.__threads = asyncio.Semaphore(get_threads_config())
+        if get_adaptive_threads():
+            ret_sched.__adaptive = AdaptiveConcurrency(client, get_threads_config(), get_adaptive_fetch_target_config(), 
+                                                       get_adaptive_max_queued_config())
+            ret_sched.__threads = ret_sched.__adaptive
+        else:
+            ret_sched.__adaptive = None
+            ret_sched.__threads = PrioritySlots(get_threads_config())
+
+        ret_sched.__priority = SubmissionPriority(ret_sched.__policies)
+        ret_sched.__repo_cache = RepoConfigCache(get_repo_cache_seconds_config(), get_repo_cache_size_config()) \
+            if get_repo_cache_seconds_config() > 0 else None
+        ret_sched.__limiter = SubmissionRateLimiter(get_submit_rate_config(), get_submit_burst_config()) \
+            if get_submit_rate_config() > 0 else None
+        ret_sched.__recent = RecentScanIndex(client, get_recent_scan_hours_config(), get_recent_scan_refresh_seconds_config()) \
+            if get_bulk_recent_scans() and get_recent_scan_hours_config() > 0 else None
+        ret_sched.__prefire = PreFireChecks(client, ret_sched.__recent) if get_batch_prefire_checks() else None
+        host_limits = load_scm_host_limits()
+        ret_sched.__hosts = HostConcurrency(host_limits, get_scm_default_limit_config()) \
+            if len(host_limits) > 0 or get_scm_default_limit_config() > 0 else None
+        ret_sched.__throttle = FetchThrottleMonitor(client, get_fetch_poll_seconds_config()) if get_fetch_throttle() else None
+        ret_sched.__priority.watch(ret_sched.__threads)
+        if ret_sched.__hosts is not None:
+            ret_sched.__priority.watch(ret_sched.__hosts)
 
         ret_sched.__scheduler = AsyncIOScheduler(job_defaults={"coalesce" : True, "misfire_grace_time" : None})
+        # Jobs are never missed with no misfire grace time; a job is only skipped when its previous run is still going.
+        ret_sched.__scheduler.add_listener(ret_sched.__job_missed, EVENT_JOB_MAX_INSTANCES)
         ret_sched.__scheduler.start()
-        ret_sched.__trigger_cache = {}
-
-        for trigger in policies:
-            if policies[trigger] not in ret_sched.__trigger_cache.keys():
-                ret_sched.__trigger_cache[policies[trigger]] = CronTrigger.from_crontab(policies[trigger])
 
         ret_sched.__job_cache = {}
+        ret_sched.__dispatcher = TriggerDispatcher(ret_sched.__scheduler, ret_sched.__policies, ret_sched.__job_kwargs, 
+                                                   ret_sched.__priority) if get_dispatch_by_trigger() else None
+        ret_sched.__resolution_cache = {}
+        ret_sched.__group_crontabs = None
+        ret_sched.__resolution_context = None
+        ret_sched.__refresh_lock = asyncio.Lock()
+        ret_sched.__apply_lock = asyncio.Lock()
+        ret_sched.__crawling = False
+        ret_sched.__touched = set()
+        ret_sched.__reconcile_task = None
+        ret_sched.__the_schedule = {}
+        ret_sched.__ready = False
+        ret_sched.__startup_source = "crawl"
+        ret_sched.__started_at = monotonic()
+        ret_sched.__crawled = 0
+
+        metrics.SCHEDULED_JOBS.set_function(ret_sched.__job_counts)
+        metrics.QUEUE_WAITERS.set_function(lambda: ret_sched.submission_queue_depth)
+        metrics.THREADS.set_function(lambda: ret_sched.effective_threads)
         
         if default_schedule is not None and default_schedule in ret_sched.__policies.keys():
             ret_sched.__default_schedule = default_schedule
@@ -238,31 +557,119 @@ class Scheduler:
     
     @staticmethod
     async def audit(client, default_schedule, group_schedules, policies, bad_callback):
-        schedule = await Scheduler.__initialize(client, default_schedule, group_schedules, policies)
+        # The audit shows the schedule for all shards.
+        schedule = await Scheduler.__initialize(client, default_schedule, group_schedules, policies, sharded=False)
         return await schedule.__load_schedule(bad_callback)
 
     def __add_job(self, sched : ProjectSchedule) -> None:
+        if self.__dispatcher is not None:
+            self.__dispatcher.add(sched)
+            return
+
         async def _exec_wrapper(executor : ScanExecutor, **kwargs):
             await executor(**kwargs)
 
         if sched.project_id not in self.__job_cache.keys():
             self.__job_cache[sched.project_id] = []
 
-        self.__job_cache[sched.project_id].append(self.__scheduler.add_job(
+        self.__job_cache[sched.project_id].append((sched, self.__scheduler.add_job(
                     _exec_wrapper, 
-                    self.__trigger_cache[sched.schedule], name=str(sched),
-                    kwargs = {"executor" : ScanExecutor(self.__client), "sched" : sched, "threads" : self.__threads} ))
+                    self.__policies.trigger(sched.schedule, sched.project_id), name=str(sched),
+                    kwargs = self.__job_kwargs(sched))))
+
+    def __job_kwargs(self, sched : ProjectSchedule) -> dict:
+        return {"executor" : ScanExecutor(self.__client, self.__policies, self.__recent), "sched" : sched, "threads" : self.__threads, 
+                "limiter" : self.__limiter, "prefire" : self.__prefire, "throttle" : self.__throttle, 
+                "adaptive" : self.__adaptive, "hosts" : self.__hosts, "priority" : self.__priority, "repo_cache" : self.__repo_cache}
+
+    def __job_counts(self):
+        counts = {}
+        if self.__dispatcher is not None:
+            for crontab, count in self.__dispatcher.job_counts().items():
+                key = (self.__policies.name_of(crontab),)
+                counts[key] = counts.get(key, 0) + count
+            return counts
+
+        for jobs in self.__job_cache.values():
+            for sched, _ in jobs:
+                key = (self.__policies.name_of(sched.schedule),)
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def __job_missed(self, event) -> None:
+        # The previous run is still waiting for a slot, so it is moved to the front of the queue.
+        job = self.__scheduler.get_job(event.job_id)
+        if job is not None and "sched" in job.kwargs.keys():
+            self.__priority.missed(job.kwargs['sched'].project_id)
+
+    def __find_job(self, sched : ProjectSchedule) -> int:
+        for index, (job_sched, _) in enumerate(self.__job_cache.get(sched.project_id, [])):
+            if job_sched == sched:
+                return index
+        return -1
+
+    def __remove_job(self, sched : ProjectSchedule) -> None:
+        if self.__dispatcher is not None:
+            self.__dispatcher.remove(sched)
+            return
+
+        index = self.__find_job(sched)
+        if index >= 0:
+            _, job = self.__job_cache[sched.project_id].pop(index)
+            job.remove()
+
+        if sched.project_id in self.__job_cache.keys() and len(self.__job_cache[sched.project_id]) == 0:
+            del self.__job_cache[sched.project_id]
+
+    def __modify_job(self, old_sched : ProjectSchedule, new_sched : ProjectSchedule) -> None:
+        if self.__dispatcher is not None:
+            self.__dispatcher.modify(old_sched, new_sched)
+            return
+
+        index = self.__find_job(old_sched)
+        if index < 0:
+            self.__add_job(new_sched)
+            return
+
+        _, job = self.__job_cache[old_sched.project_id][index]
+        job.modify(name=str(new_sched), kwargs=job.kwargs | {"sched" : new_sched})
+        self.__job_cache[old_sched.project_id][index] = (new_sched, job)
 
     @staticmethod
-    async def start(client, default_schedule, group_schedules, policies):
+    async def start(client, default_schedule, group_schedules, policies, initialized_cb = None):
 
         ret_sched = await Scheduler.__initialize(client, default_schedule, group_schedules, policies)
-        ret_sched.__the_schedule = await ret_sched.__load_schedule(None)
-
-        for pid in ret_sched.__the_schedule:
-            for scan_sched in ret_sched.__the_schedule[pid]:
-                ret_sched.__add_job(scan_sched)
+        # Only a running scheduler submits scans; audit and forecast never start the queue poll.
+        if ret_sched.__adaptive is not None:
+            ret_sched.__adaptive.start()
+        if initialized_cb is not None:
+            initialized_cb(ret_sched)
+
+        snapshot = await ret_sched.__load_snapshot()
+        if snapshot is not None:
+            ret_sched.__startup_source = "snapshot"
+            ret_sched.__the_schedule = snapshot
+            for pid in ret_sched.__the_schedule:
+                for scan_sched in ret_sched.__the_schedule[pid]:
+                    ret_sched.__add_job(scan_sched)
+        else:
+            # Each resolved project is scheduled immediately rather than after the crawl completes
+            # so that a trigger that fires during a long crawl still runs the projects found so far.
+            def register(entry):
+                for pid, scheds in entry.items():
+                    ret_sched.__the_schedule[pid] = scheds
+                    for scan_sched in scheds:
+                        ret_sched.__add_job(scan_sched)
+
+            await ret_sched.__load_schedule(None, register)
+
+        ret_sched.__ready = True
+        Scheduler.__log.info(f"Scheduler ready after {timedelta(seconds=monotonic() - ret_sched.__started_at)}")
+
+        if snapshot is not None:
+            Scheduler.__log.info(f"Started with {ret_sched.scheduled_scans} project schedules from snapshot, reconciling in the background.")
+            ret_sched.__reconcile_task = asyncio.create_task(ret_sched.__reconcile())
+        else:
+            await ret_sched.__save_snapshot()
 
         return ret_sched
-
-
@@ -0,0 +1,86 @@
+import logging, asyncio
+from cxone_api import CxOneClient
+from cxone_api.util import json_on_ok
+from cxone_api.low.projects import retrieve_list_of_projects
+from typing import AsyncGenerator, Dict, List
+
+
+class CrawlPlanner:
+    # Chooses the project queries needed to find every project that can be scheduled.  Without a
+    # default schedule, only tagged projects and members of scheduled groups can be scheduled, so
+    # those are queried directly instead of crawling every project in the tenant.
+    __log = logging.getLogger("CrawlPlanner")
+
+    def __init__(self, default_schedule : str, group_ids : List[str]):
+        self.__default_schedule = default_schedule
+        self.__group_ids = sorted(group_ids)
+
+    @property
+    def queries(self) -> List[Dict]:
+        if self.__default_schedule is not None:
+            return [{}]
+
+        return [{'tags_keys' : 'schedule'}] + [{'groups' : [gid]} for gid in self.__group_ids]
+
+    @staticmethod
+    async def __pages(client : CxOneClient, query : Dict, page_size : int, page_concurrency : int) -> AsyncGenerator[List[Dict], None]:
+        async def fetch(offset):
+            return json_on_ok(await retrieve_list_of_projects(client, offset=offset, limit=page_size, **query))
+
+        # The first page gives the number of matching projects so the remaining pages can be
+        # requested concurrently.  Pages are yielded in the order they arrive.
+        first = await fetch(0)
+        page = first['projects'] or []
+        yield page
+        if len(page) < page_size:
+            return
+
+        total = first.get('filteredTotalCount', first.get('totalCount', 0))
+        offsets = iter(range(page_size, total, page_size))
+        pending = set()
+        try:
+            while True:
+                while len(pending) < page_concurrency:
+                    offset = next(offsets, None)
+                    if offset is None:
+                        break
+                    pending.add(asyncio.create_task(fetch(offset)))
+
+                if len(pending) == 0:
+                    break
+
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()['projects'] or []
+        finally:
+            for task in pending:
+                task.cancel()
+
+        # Projects created during the crawl shift later projects past the count read from the
+        # first page; keep reading until a page is not full.
+        offset = max(page_size, -(-total // page_size) * page_size)
+        while True:
+            page = (await fetch(offset))['projects'] or []
+            yield page
+            if len(page) < page_size:
+                return
+            offset += page_size
+
+    async def projects(self, client : CxOneClient, page_size : int = 100, page_concurrency : int = 1) -> AsyncGenerator[Dict, None]:
+        # A project that is tagged and in one or more scheduled groups is returned by several
+        # queries, and a project can appear on two pages if projects change during the crawl.
+        # It is only yielded the first time.
+        seen = set()
+        duplicates = 0
+
+        for query in self.queries:
+            async for page in CrawlPlanner.__pages(client, query, page_size, page_concurrency):
+                for project in page:
+                    if project['id'] in seen:
+                        duplicates += 1
+                        continue
+
+                    seen.add(project['id'])
+                    yield project
+
+        CrawlPlanner.__log.debug(f"Crawl used {len(self.queries)} queries, {len(seen)} projects found, {duplicates} duplicates skipped")
@@ -0,0 +1,106 @@
+from utils import ProjectSchedule
+from collections import Counter
+from typing import Dict, List, Tuple
+
+
+class ProjectScheduleChange:
+
+    def __init__(self, project_id : str, removed : List[ProjectSchedule], added : List[ProjectSchedule], 
+                 modified : List[Tuple[ProjectSchedule, ProjectSchedule]]):
+        self.__project_id = project_id
+        self.__removed = removed
+        self.__added = added
+        self.__modified = modified
+
+    @property
+    def project_id(self):
+        return self.__project_id
+
+    # Schedules whose trigger no longer applies to the project.
+    @property
+    def removed(self) -> List[ProjectSchedule]:
+        return self.__removed
+
+    # Schedules with a trigger that is new for the project.
+    @property
+    def added(self) -> List[ProjectSchedule]:
+        return self.__added
+
+    # (old, new) pairs that share a trigger but scan with different parameters.
+    @property
+    def modified(self) -> List[Tuple[ProjectSchedule, ProjectSchedule]]:
+        return self.__modified
+
+    @property
+    def trigger_changed(self) -> bool:
+        return len(self.__removed) > 0 or len(self.__added) > 0
+
+    def __repr__(self):
+        return f"{self.project_id}: Removed: {self.removed} Added: {self.added} Modified: {self.modified}"
+
+
+class ScheduleDiff:
+
+    def __init__(self, old_schedule : Dict[str, List[ProjectSchedule]], new_schedule : Dict[str, List[ProjectSchedule]]):
+        self.__new = {k:new_schedule[k] for k in new_schedule.keys() - old_schedule.keys()}
+        self.__removed = {k:old_schedule[k] for k in old_schedule.keys() - new_schedule.keys()}
+        self.__changed = {}
+
+        for k in new_schedule.keys() & old_schedule.keys():
+            change = ScheduleDiff.__compare(k, old_schedule[k], new_schedule[k])
+            if change is not None:
+                self.__changed[k] = change
+
+    @staticmethod
+    def __compare(project_id, old : List[ProjectSchedule], new : List[ProjectSchedule]):
+        if old is new or old == new:
+            return None
+
+        old_counts = Counter(old)
+        new_counts = Counter(new)
+
+        if old_counts == new_counts:
+            return None
+
+        removed = list((old_counts - new_counts).elements())
+        added = list((new_counts - old_counts).elements())
+        modified = []
+
+        # Pair schedules on the same trigger so the existing job can be updated in place.
+        for old_sched in list(removed):
+            for new_sched in added:
+                if new_sched.schedule == old_sched.schedule:
+                    modified.append((old_sched, new_sched))
+                    removed.remove(old_sched)
+                    added.remove(new_sched)
+                    break
+
+        return ProjectScheduleChange(project_id, removed, added, modified)
+
+    @property
+    def new(self) -> Dict[str, List[ProjectSchedule]]:
+        return self.__new
+
+    @property
+    def removed(self) -> Dict[str, List[ProjectSchedule]]:
+        return self.__removed
+
+    @property
+    def changed(self) -> Dict[str, ProjectScheduleChange]:
+        return self.__changed
+
+    @property
+    def trigger_changed(self) -> List[ProjectScheduleChange]:
+        return [x for x in self.__changed.values() if x.trigger_changed]
+
+    @property
+    def payload_changed(self) -> List[ProjectScheduleChange]:
+        return [x for x in self.__changed.values() if not x.trigger_changed]
+
+    @property
+    def empty(self) -> bool:
+        return len(self.__new) == 0 and len(self.__removed) == 0 and len(self.__changed) == 0
+
+    def __repr__(self):
+        return f"New: {len(self.new)} Removed: {len(self.removed)} Changed: {len(self.changed)} " + \
+            f"(Trigger: {len(self.trigger_changed)} Payload: {len(self.payload_changed)})"
@@ -0,0 +1,89 @@
+import asyncio, logging
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from utils import ProjectSchedule, PolicyRegistry
+from typing import Callable, Dict, List
+
+
+class TriggerDispatcher:
+    # One job per crontab.  When the job fires, the projects currently indexed under the crontab
+    # are submitted; schedule changes only update the index.
+    __log = logging.getLogger("TriggerDispatcher")
+
+    def __init__(self, scheduler : AsyncIOScheduler, policies : PolicyRegistry, job_kwargs : Callable[[ProjectSchedule], Dict], priority = None):
+        self.__scheduler = scheduler
+        self.__policies = policies
+        self.__job_kwargs = job_kwargs
+        self.__priority = priority
+        self.__index = {}
+        self.__jobs = {}
+        self.__running = {}
+
+    def add(self, sched : ProjectSchedule) -> None:
+        by_project = self.__index.setdefault(sched.schedule, {})
+        by_project.setdefault(sched.project_id, []).append(sched)
+
+        if sched.schedule not in self.__jobs.keys():
+            self.__jobs[sched.schedule] = self.__scheduler.add_job(self.__fire, self.__policies.trigger(sched.schedule), 
+                                                                   args=[sched.schedule], name=f"dispatch:{sched.schedule}")
+
+    def remove(self, sched : ProjectSchedule) -> None:
+        by_project = self.__index.get(sched.schedule, {})
+        entries = by_project.get(sched.project_id, [])
+        if sched in entries:
+            entries.remove(sched)
+        if len(entries) == 0:
+            by_project.pop(sched.project_id, None)
+
+        if len(by_project) == 0 and sched.schedule in self.__jobs.keys():
+            self.__index.pop(sched.schedule, None)
+            self.__jobs.pop(sched.schedule).remove()
+
+    def modify(self, old_sched : ProjectSchedule, new_sched : ProjectSchedule) -> None:
+        entries = self.__index.get(old_sched.schedule, {}).get(old_sched.project_id, [])
+        if old_sched in entries:
+            entries[entries.index(old_sched)] = new_sched
+        else:
+            self.add(new_sched)
+
+    def remove_project(self, project_id : str, scheds : List[ProjectSchedule]) -> None:
+        for sched in scheds:
+            self.remove(sched)
+
+    def job_counts(self) -> Dict[str, int]:
+        return {crontab : sum([len(x) for x in by_project.values()]) for crontab, by_project in self.__index.items()}
+
+    @property
+    def jobs(self) -> int:
+        return len(self.__jobs)
+
+    async def __fire(self, crontab : str) -> None:
+        project_ids = list(self.__index.get(crontab, {}).keys())
+        TriggerDispatcher.__log.debug(f"Trigger [{crontab}] fired for {len(project_ids)} projects")
+
+        for project_id in project_ids:
+            key = (project_id, crontab)
+            running = self.__running.get(key, None)
+            if running is not None and not running.done():
+                # Same as a per-project job that is still running when it fires again.
+                TriggerDispatcher.__log.warning(f"Previous scheduled scan for project {project_id} [{crontab}] is still running, skipping.")
+                if self.__priority is not None:
+                    self.__priority.missed(project_id)
+                continue
+
+            task = asyncio.create_task(self.__run(project_id, crontab))
+            self.__running[key] = task
+            task.add_done_callback(lambda t, k=key: self.__running.pop(k, None) if self.__running.get(k, None) is t else None)
+
+    async def __run(self, project_id : str, crontab : str) -> None:
+        offset = self.__policies.offset(crontab, project_id)
+        if offset > 0:
+            await asyncio.sleep(offset)
+
+        # The schedule may have been updated while waiting for the spread offset.
+        for sched in list(self.__index.get(crontab, {}).get(project_id, [])):
+            kwargs = self.__job_kwargs(sched)
+            executor = kwargs.pop("executor")
+            try:
+                await executor(**kwargs)
+            except Exception as ex:
+                TriggerDispatcher.__log.exception(ex)
@@ -0,0 +1,83 @@
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from scan import HostConcurrency
+from utils import ProjectSchedule, PolicyRegistry, get_repo_host
+from typing import Dict, Iterator, List, Tuple
+
+
+class ScheduleForecast:
+    __log = logging.getLogger("ScheduleForecast")
+    __UNKNOWN_HOST = "unknown"
+
+    def __init__(self, policies : PolicyRegistry, schedule : Dict[str, List[ProjectSchedule]], limit : int, 
+                 hosts : HostConcurrency = None):
+        self.__policies = policies
+        self.__limit = limit
+        self.__hosts = hosts
+
+        # Projects are counted by everything that decides when and where they fire, so each
+        # distinct trigger is expanded once no matter how many projects use it.
+        self.__groups = Counter()
+        for entries in schedule.values():
+            for sched in entries:
+                host = get_repo_host(sched.repo_url)
+                self.__groups[(sched.schedule, policies.offset(sched.schedule, sched.project_id) // 60, 
+                               policies.name_of(sched.schedule), host if host is not None else ScheduleForecast.__UNKNOWN_HOST)] += 1
+
+    def __fire_times(self, crontab : str, start : datetime, end : datetime) -> List[datetime]:
+        trigger = self.__policies.trigger(crontab)
+        times = []
+        previous = None
+        now = start
+
+        while True:
+            fire_time = trigger.get_next_fire_time(previous, now)
+            if fire_time is None or fire_time >= end:
+                break
+            times.append(fire_time)
+            previous = fire_time
+            now = fire_time + timedelta(seconds=1)
+
+        return times
+
+    def histogram(self, start : datetime, hours : int) -> Dict[datetime, Counter]:
+        start = start.replace(second=0, microsecond=0)
+        end = start + timedelta(hours=hours)
+
+        by_crontab = {}
+        for (crontab, offset_minutes, policy, host), count in self.__groups.items():
+            by_crontab.setdefault(crontab, []).append((offset_minutes, policy, host, count))
+
+        minutes = {}
+        for crontab, groups in by_crontab.items():
+            # Scans spread after a fire time before the start can still land inside the horizon.
+            fire_times = self.__fire_times(crontab, start - timedelta(seconds=self.__policies.spread(crontab)), end)
+            ScheduleForecast.__log.debug(f"Trigger [{crontab}] fires {len(fire_times)} times for {len(groups)} project groups")
+
+            for fire_time in fire_times:
+                for offset_minutes, policy, host, count in groups:
+                    minute = fire_time.replace(second=0, microsecond=0) + timedelta(minutes=offset_minutes)
+                    if start <= minute < end:
+                        minutes.setdefault(minute, Counter())[(policy, host)] += count
+
+        return dict(sorted(minutes.items()))
+
+    def rows(self, start : datetime, hours : int) -> Iterator[Tuple[datetime, str, str, int, int, List[str]]]:
+        # One row per minute, policy, and SCM host.  A minute is a hot spot when more scans are due in it
+        # than can be submitted concurrently, either overall or for one SCM host.
+        for minute, counts in self.histogram(start, hours).items():
+            total = sum(counts.values())
+            by_host = Counter()
+            for (_, host), count in counts.items():
+                by_host[host] += count
+
+            for (policy, host), count in sorted(counts.items()):
+                flags = []
+                if self.__limit > 0 and total > self.__limit:
+                    flags.append("THREADS")
+                if self.__hosts is not None and host != ScheduleForecast.__UNKNOWN_HOST:
+                    host_limit = self.__hosts.limit_for(host)
+                    if host_limit > 0 and by_host[host] > host_limit:
+                        flags.append("SCM_HOST")
+                yield minute, policy, host, count, total, flags
@@ -0,0 +1,47 @@
+import logging, json, os, aiofiles
+from utils import ProjectSchedule
+from datetime import datetime, timezone
+from typing import Dict, List, Union
+
+
+class ScheduleSnapshot:
+    __VERSION = 1
+    __log = logging.getLogger("ScheduleSnapshot")
+
+    @staticmethod
+    async def save(path : str, schedule : Dict[str, List[ProjectSchedule]]) -> None:
+        content = json.dumps({
+            "version" : ScheduleSnapshot.__VERSION,
+            "saved" : datetime.now(timezone.utc).isoformat(),
+            "schedule" : {pid : [sched.to_dict() for sched in schedule[pid]] for pid in schedule.keys()}
+        })
+
+        # Write to a temporary file and swap it in so a crash never leaves a partial snapshot.
+        temp_path = f"{path}.tmp"
+        try:
+            async with aiofiles.open(temp_path, "wt") as f:
+                await f.write(content)
+            os.replace(temp_path, path)
+            ScheduleSnapshot.__log.debug(f"Saved schedule snapshot with {len(schedule.keys())} projects to {path}")
+        except OSError as ex:
+            ScheduleSnapshot.__log.error(f"Unable to save schedule snapshot to {path}: {ex}")
+
+    @staticmethod
+    async def load(path : str) -> Union[Dict[str, List[ProjectSchedule]], None]:
+        if not os.path.exists(path):
+            ScheduleSnapshot.__log.info(f"No schedule snapshot found at {path}")
+            return None
+
+        try:
+            async with aiofiles.open(path, "rt") as f:
+                content = json.loads(await f.read())
+
+            if content.get("version", None) != ScheduleSnapshot.__VERSION:
+                ScheduleSnapshot.__log.warning(f"Ignoring schedule snapshot {path} with unsupported version {content.get('version', None)}")
+                return None
+
+            ScheduleSnapshot.__log.info(f"Loaded schedule snapshot saved at {content['saved']}")
+            return {pid : [ProjectSchedule.from_dict(x) for x in entries] for pid, entries in content['schedule'].items()}
+        except (OSError, ValueError, KeyError, TypeError) as ex:
+            ScheduleSnapshot.__log.error(f"Unable to load schedule snapshot from {path}: {ex}")
+            return None
@@ -0,0 +1,204 @@
+import re, threading
+from time import perf_counter
+from urllib.parse import urlsplit
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple, Union
+
+
+_ID_SEGMENT = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9]+")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    TYPE = None
+
+    def __init__(self, name : str, help : str, labels : Tuple[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels : Dict) -> Tuple:
+        if set(labels.keys()) != set(self.labels):
+            raise ValueError(f"Metric {self.name} expects labels {self.labels}, got {tuple(labels.keys())}")
+        return tuple(str(labels[x]) for x in self.labels)
+
+    def _label_string(self, key : Tuple, extra : Dict = None) -> str:
+        pairs = list(zip(self.labels, key)) + list((extra if extra is not None else {}).items())
+        if len(pairs) == 0:
+            return ""
+        return "{" + ",".join([f'{k}="{_escape(v)}"' for k, v in pairs]) + "}"
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._label_string(k)} {_format_value(v)}" for k, v in self._values.items()]
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.TYPE}"] + self._samples())
+
+
+class Counter(_Metric):
+    TYPE = "counter"
+
+    def inc(self, amount : Union[int, float] = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    TYPE = "gauge"
+
+    def __init__(self, name : str, help : str, labels : Tuple[str] = ()):
+        super().__init__(name, help, labels)
+        self.__function = None
+
+    def set(self, value : Union[int, float], **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function : Callable) -> None:
+        # The function is called at collection time.  It returns a value for a gauge without
+        # labels, or a dictionary of label value tuples to values.
+        self.__function = function
+
+    def _samples(self) -> List[str]:
+        if self.__function is None:
+            return super()._samples()
+
+        values = self.__function()
+        if not isinstance(values, dict):
+            values = {() : values}
+        return [f"{self.name}{self._label_string(k)} {_format_value(v)}" for k, v in values.items()]
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+    def __init__(self, name : str, help : str, labels : Tuple[str] = (), buckets : Tuple[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.__buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value : float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.__buckets), 0.0))
+            for index, bound in enumerate(self.__buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        samples = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                for bound, count in zip(self.__buckets, counts):
+                    samples.append(f"{self.name}_bucket{self._label_string(key, {'le' : _format_value(bound)})} {count}")
+                samples.append(f"{self.name}_sum{self._label_string(key)} {_format_value(total)}")
+                samples.append(f"{self.name}_count{self._label_string(key)} {counts[-1]}")
+        return samples
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.__metrics = {}
+
+    def __register(self, metric : _Metric) -> _Metric:
+        if metric.name in self.__metrics.keys():
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self.__metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name : str, help : str, labels : Tuple[str] = ()) -> Counter:
+        return self.__register(Counter(name, help, labels))
+
+    def gauge(self, name : str, help : str, labels : Tuple[str] = ()) -> Gauge:
+        return self.__register(Gauge(name, help, labels))
+
+    def histogram(self, name : str, help : str, labels : Tuple[str] = (), buckets : Tuple[float] = Histogram.DEFAULT_BUCKETS) -> Histogram:
+        return self.__register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        return "\n".join([m.render() for m in self.__metrics.values()]) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+API_LATENCY = REGISTRY.histogram("cxone_scheduler_api_request_seconds", "Checkmarx One API request latency.", ("method", "endpoint"))
+API_ERRORS = REGISTRY.counter("cxone_scheduler_api_errors_total", 
+                              "Checkmarx One API requests that failed or returned an error status.", ("method", "endpoint", "status"))
+
+CRAWL_SECONDS = REGISTRY.gauge("cxone_scheduler_crawl_seconds", "Duration of the last project crawl.")
+CRAWL_PROJECTS = REGISTRY.gauge("cxone_scheduler_crawl_projects", "Projects visited by the last project crawl.")
+CRAWL_RATE = REGISTRY.gauge("cxone_scheduler_crawl_projects_per_second", "Projects visited per second by the last project crawl.")
+CRAWLS = REGISTRY.counter("cxone_scheduler_crawls_total", "Project crawls started.")
+
+SCHEDULED_JOBS = REGISTRY.gauge("cxone_scheduler_jobs", "Registered scan jobs.", ("policy",))
+QUEUE_WAITERS = REGISTRY.gauge("cxone_scheduler_submission_waiters", "Scans waiting for a submission thread.")
+QUEUE_WAIT = REGISTRY.histogram("cxone_scheduler_submission_wait_seconds", "Time a scan waited for a submission thread.", ("policy",))
+THREADS = REGISTRY.gauge("cxone_scheduler_submission_threads", "Effective scan submission threads.")
+THROTTLE_WAIT = REGISTRY.histogram("cxone_scheduler_fetch_throttle_wait_seconds", 
+                                   "Time a submission thread waited for the source fetch.", ("reason",))
+
+REPO_CACHE = REGISTRY.counter("cxone_scheduler_repo_cache_total", "Repository configuration cache lookups when a scan fires.", ("result",))
+
+SCANS = REGISTRY.counter("cxone_scheduler_scans_total", "Scheduled scan outcomes.", ("policy", "outcome"))
+
+PHASE_SECONDS = REGISTRY.histogram("cxone_scheduler_phase_seconds", "Time spent in each stage of loading the schedule and submitting scans.", ("phase",))
+LOOP_LAG = REGISTRY.histogram("cxone_scheduler_event_loop_lag_seconds", "Delay of the event loop beyond a scheduled wake-up when profiling.")
+
+
+def endpoint_label(url : str) -> str:
+    # Ids in the path would make a label value for every project and scan.
+    segments = urlsplit(str(url)).path.split("/")
+    return "/".join(["{id}" if _ID_SEGMENT.fullmatch(s) else s for s in segments])
+
+
+def instrument_client(client) -> None:
+    # Wraps the client's request methods so all API calls, including those made by the cxone_api
+    # helpers, are timed.
+    def wrap(method_name):
+        method = getattr(client, method_name)
+
+        async def timed(url, *args, **kwargs):
+            endpoint = endpoint_label(url)
+            start = perf_counter()
+            try:
+                response = await method(url, *args, **kwargs)
+            except BaseException as ex:
+                API_ERRORS.inc(method=method_name.upper(), endpoint=endpoint, status=type(ex).__name__)
+                raise
+            finally:
+                API_LATENCY.observe(perf_counter() - start, method=method_name.upper(), endpoint=endpoint)
+
+            status = getattr(response, "status_code", None)
+            if status is not None and status >= 400:
+                API_ERRORS.inc(method=method_name.upper(), endpoint=endpoint, status=status)
+            return response
+
+        setattr(client, method_name, timed)
+
+    for method_name in ["get", "post", "put", "delete"]:
+        if hasattr(client, method_name):
+            wrap(method_name)
@@ -0,0 +1,202 @@
+import asyncio, logging, os, re, sys, threading, traceback
+from . import PHASE_SECONDS, LOOP_LAG
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from time import monotonic, perf_counter
+from typing import Dict
+
+
+class SamplingProfiler:
+    # Samples the stacks of all threads while at least one profile session is working.  Each session
+    # is written as collapsed stacks ("frame;frame;frame count") that flame graph tools can read.
+    # Time the event loop spends waiting for API responses shows as samples in the selector.
+    __log = logging.getLogger("SamplingProfiler")
+    __current = ContextVar("profile_session", default=None)
+
+    def __init__(self, path : str, interval : float):
+        self.__path = path
+        self.__interval = interval
+        self.__lock = threading.Lock()
+        self.__sessions = {}
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def start(self) -> None:
+        os.makedirs(self.__path, exist_ok=True)
+        self.__thread = threading.Thread(target=self.__sample_loop, name="SamplingProfiler", daemon=True)
+        self.__thread.start()
+        SamplingProfiler.__log.info(f"Sampling every {self.__interval * 1000:.0f}ms, profiles are written to {self.__path}")
+
+    def stop(self) -> None:
+        self.__stop.set()
+
+    @staticmethod
+    def __collapse(thread_name : str, frame) -> str:
+        stack = []
+        while frame is not None:
+            stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+            frame = frame.f_back
+        return ";".join([thread_name] + list(reversed(stack)))
+
+    def __sample_loop(self) -> None:
+        own_id = threading.get_ident()
+        while not self.__stop.wait(self.__interval):
+            with self.__lock:
+                working = [s for s in self.__sessions.values() if s['working'] > 0]
+                if len(working) == 0:
+                    continue
+                names = {t.ident : t.name for t in threading.enumerate()}
+                stacks = [SamplingProfiler.__collapse(names.get(tid, str(tid)), frame)
+                          for tid, frame in sys._current_frames().items() 
+                          if tid != own_id and names.get(tid, None) != "LoopLagMonitor"]
+                for session in working:
+                    session['samples'].update(stacks)
+
+    @contextmanager
+    def session(self, name : str, key : datetime = None):
+        # Sessions with the same name and key share one profile, so concurrent scans of one trigger
+        # fire are written to a single file when the last of them completes.  The key is the time of
+        # the fire; scans of the same fire that start later are added to the same file.
+        with self.__lock:
+            if (name, key) not in self.__sessions.keys():
+                self.__sessions[(name, key)] = {'refs' : 0, 'working' : 0, 'samples' : Counter(), 'started' : datetime.now()}
+            session = self.__sessions[(name, key)]
+            session['refs'] += 1
+            session['working'] += 1
+        token = SamplingProfiler.__current.set(session)
+        try:
+            yield
+        finally:
+            SamplingProfiler.__current.reset(token)
+            with self.__lock:
+                session['refs'] -= 1
+                session['working'] -= 1
+                if session['refs'] == 0:
+                    del self.__sessions[(name, key)]
+                else:
+                    session = None
+            if session is not None:
+                self.__write(name, key if key is not None else session['started'], session)
+
+    @contextmanager
+    def waiting(self):
+        # The current session is not sampled while its caller waits, unless others in it are working.
+        session = SamplingProfiler.__current.get()
+        if session is None:
+            yield
+            return
+
+        with self.__lock:
+            session['working'] -= 1
+        try:
+            yield
+        finally:
+            with self.__lock:
+                session['working'] += 1
+
+    def __write(self, name : str, stamp : datetime, session : Dict) -> None:
+        safe_name = re.sub(r"[^\w.-]", "_", name)
+        file_name = f"{safe_name}-{stamp.strftime('%Y%m%dT%H%M%S')}.folded"
+        path = os.path.join(self.__path, file_name)
+        samples = Counter(session['samples'])
+        try:
+            if os.path.exists(path):
+                with open(path, "rt") as f:
+                    for line in f.read().splitlines():
+                        stack, count = line.rsplit(" ", 1)
+                        samples[stack] += int(count)
+            with open(path, "wt") as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            SamplingProfiler.__log.info(f"Profile {name}: {sum(session['samples'].values())} samples written to {file_name}")
+        except (OSError, ValueError) as ex:
+            SamplingProfiler.__log.exception(ex)
+
+
+class LoopLagMonitor:
+    # A coroutine records how late the event loop wakes it.  A separate thread notices when the
+    # coroutine has not run for longer than the threshold and logs the stack of the loop's thread
+    # while it is still blocked.
+    __log = logging.getLogger("LoopLagMonitor")
+
+    def __init__(self, threshold : float, interval : float = 0.1):
+        self.__threshold = threshold
+        self.__interval = interval
+        self.__beat = monotonic()
+        self.__loop_thread = None
+        self.__task = None
+        self.__stop = threading.Event()
+
+    def start(self) -> None:
+        self.__loop_thread = threading.get_ident()
+        self.__beat = monotonic()
+        self.__task = asyncio.get_running_loop().create_task(self.__tick())
+        threading.Thread(target=self.__watch, name="LoopLagMonitor", daemon=True).start()
+
+    def stop(self) -> None:
+        self.__stop.set()
+        if self.__task is not None:
+            self.__task.cancel()
+
+    async def __tick(self) -> None:
+        while True:
+            expected = monotonic() + self.__interval
+            await asyncio.sleep(self.__interval)
+            now = monotonic()
+            LOOP_LAG.observe(max(0, now - expected))
+            self.__beat = now
+
+    def __watch(self) -> None:
+        reported = False
+        while not self.__stop.wait(self.__interval):
+            stalled = monotonic() - self.__beat - self.__interval
+            if stalled <= self.__threshold:
+                reported = False
+            elif not reported:
+                reported = True
+                frame = sys._current_frames().get(self.__loop_thread, None)
+                stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>"
+                LoopLagMonitor.__log.warning(f"Event loop blocked for {stalled:.3f}s, blocking stack:\n{stack}")
+
+
+__log = logging.getLogger("profiling")
+__profiler = None
+__monitor = None
+
+
+def start(path : str, interval : float, lag_threshold : float) -> None:
+    # Must be called from the event loop that is monitored.
+    global __profiler, __monitor
+    if __profiler is not None:
+        __profiler.stop()
+        __monitor.stop()
+    __profiler = SamplingProfiler(path, interval)
+    __profiler.start()
+    __monitor = LoopLagMonitor(lag_threshold)
+    __monitor.start()
+
+
+def enabled() -> bool:
+    return __profiler is not None
+
+
+def profile(name : str, key : datetime = None):
+    return __profiler.session(name, key) if __profiler is not None else nullcontext()
+
+
+def waiting():
+    return __profiler.waiting() if __profiler is not None else nullcontext()
+
+
+@contextmanager
+def phase(name : str):
+    phase_start = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - phase_start
+        PHASE_SECONDS.observe(elapsed, phase=name)
+        if __profiler is not None:
+            __log.debug(f"Phase {name}: {elapsed:.3f}s")
@@ -1,93 +1,157 @@
 from cxone_api import CxOneClient
-from cxone_api.high.scans import ScanInvoker, ScanInspector, ScanLoader
+from cxone_api.high.scans import ScanInvoker
 from cxone_api.high.projects import ProjectRepoConfig
 from cxone_api.low.projects import retrieve_last_scan
-from cxone_api.low.scans import retrieve_list_of_scans, retrieve_scan_workflow
+from cxone_api.low.scans import retrieve_list_of_scans
 from cxone_api.util import json_on_ok
+from cxone_api.exceptions import CommunicationException
 from utils import (create_engine_scan_config, 
                    get_recent_scan_hours_config, 
                    get_fetch_timeout_config,
-                   get_fetch_throttle, ProjectSchedule)
-from typing import List, Union
-import asyncio, logging
+                   get_fetch_throttle, ProjectSchedule, PolicyRegistry)
+from typing import List
+from .ratelimit import SubmissionRateLimiter
+from .prefire import PreFireChecks, ProjectFireStatus
+from .throttle import FetchThrottleMonitor
+from .concurrency import AdaptiveConcurrency
+from .hosts import HostConcurrency
+from .queue import PrioritySlots, SubmissionPriority
+from .repocache import RepoConfigCache
+from .recent import RecentScanIndex
+import asyncio, logging, metrics
+from metrics import profiling
+from time import perf_counter
+from contextlib import AsyncExitStack
 from datetime import datetime, timedelta, timezone
 from requests import Response
 
 
 class ScanExecutor:
-  __CHECK_DELAY_S = 30
   __SCHEDULE_TAG = "scheduled"
 
   @classmethod
   def log(clazz):
       return logging.getLogger("Scanner")
 
-  def __init__(self, client : CxOneClient):
+  def __init__(self, client : CxOneClient, policies : PolicyRegistry = None, recent : RecentScanIndex = None):
     self.__client = client
+    self.__policies = policies
+    self.__recent = recent
+
+
+  async def __call__(self, sched : ProjectSchedule, threads : PrioritySlots, limiter : SubmissionRateLimiter = None, 
+                     prefire : PreFireChecks = None, throttle : FetchThrottleMonitor = None, adaptive : AdaptiveConcurrency = None,
+                     hosts : HostConcurrency = None, priority : SubmissionPriority = None, repo_cache : RepoConfigCache = None):
+    policy = self.__policies.name_of(sched.schedule) if self.__policies is not None else sched.schedule
+
+    # Scans of the same policy that fire together share one profile, keyed by the trigger's fire time
+    # before the project's spread offset.  Waits for slots and source fetches are not sampled.
+    offset = self.__policies.offset(sched.schedule, sched.project_id) if self.__policies is not None else 0
+    fired = (datetime.now() - timedelta(seconds=offset)).replace(second=0, microsecond=0)
+    with profiling.profile(f"fire-{policy}", fired):
+      fire_status = None
+      if prefire is not None:
+        with profiling.phase("scan_prefire"):
+          fire_status = await prefire.status(sched.schedule, sched.project_id)
+
+      wait_start = perf_counter()
+      order = priority.priority(sched.project_id, sched.schedule) if priority is not None else None
+      async with AsyncExitStack() as slots:
+        with profiling.waiting():
+          if hosts is not None:
+            await slots.enter_async_context(hosts.slot(sched.repo_url, order, sched.project_id))
+          await slots.enter_async_context(threads.slot(order, sched.project_id))
+        metrics.QUEUE_WAIT.observe(perf_counter() - wait_start, policy=policy)
+        metrics.PHASE_SECONDS.observe(perf_counter() - wait_start, phase="scan_queue")
+        with profiling.phase("scan_submit"):
+          outcome = await self.__submit(sched, limiter, throttle, adaptive, priority, fire_status, repo_cache)
+        metrics.SCANS.inc(policy=policy, outcome=outcome)
+
+  async def __submit(self, sched : ProjectSchedule, limiter : SubmissionRateLimiter, throttle : FetchThrottleMonitor, 
+                     adaptive : AdaptiveConcurrency, priority : SubmissionPriority, fire_status : ProjectFireStatus,
+                     repo_cache : RepoConfigCache) -> str:
+    try:
+        project_repo = repo_cache.get(sched.project_id) if repo_cache is not None else None
+        if project_repo is None:
+            project_repo = await ProjectRepoConfig.from_project_id(self.__client, sched.project_id)
+            if repo_cache is not None:
+                metrics.REPO_CACHE.inc(result="miss")
+                repo_cache.put(sched.project_id, project_repo)
+        else:
+            metrics.REPO_CACHE.inc(result="hit")
 
+        safe_name = ScanExecutor.__create_name(project_repo.name, sched.project_id, sched.repo_url, sched.branch)
 
-  async def __call__(self, sched : ProjectSchedule, threads : asyncio.Semaphore):
-    async with threads:
-        try:
-            project_repo = await ProjectRepoConfig.from_project_id(self.__client, sched.project_id)
-            safe_name = ScanExecutor.__create_name(project_repo.name, sched.project_id, sched.repo_url, sched.branch)
+        tag = {ScanExecutor.__SCHEDULE_TAG: sched.schedule} if sched.schedule is not None else {ScanExecutor.__SCHEDULE_TAG : None}
 
-            tag = {ScanExecutor.__SCHEDULE_TAG: sched.schedule} if sched.schedule is not None else {ScanExecutor.__SCHEDULE_TAG : None}
 
+        # Do not submit a scheduled scan if a scheduled scan is already running.
+        if await self.__should_scan(project_repo, sched.branch, fire_status):
+            if limiter is not None:
+                with profiling.waiting():
+                    await limiter.acquire()
 
-            # Do not submit a scheduled scan if a scheduled scan is already running.
-            if await self.__should_scan(project_repo, sched.branch):
+            try:
                 scan_response = await ScanInvoker.scan_by_project_config(self.__client, 
                                                                         sched.project_id, 
                                                                         sched.branch, 
                                                                         create_engine_scan_config(sched.engines),
                                                                         tag)
-
+            except CommunicationException:
+                if priority is not None:
+                    priority.missed(sched.project_id)
+                if limiter is not None:
+                    limiter.throttled()
+                if adaptive is not None:
+                    adaptive.submission_failed()
+                raise
+
+            if limiter is not None:
+                limiter.feedback(scan_response.status_code)
+
+            if adaptive is not None:
+                if scan_response.status_code == 429 or scan_response.status_code >= 500:
+                    adaptive.submission_failed()
+                elif scan_response.ok and not (get_fetch_throttle() and throttle is not None):
+                    adaptive.submission_succeeded()
+
+            if priority is not None:
                 if scan_response.ok:
-                    ScanExecutor.log().info(f"Scanning {safe_name}")
-
-                    if get_fetch_throttle():
-                        scan_insp = None
-                        timeout_check = datetime.now()
-                        overtime = False
-                        while not overtime:
-                            overtime = (datetime.now() - timeout_check).seconds > get_fetch_timeout_config()
-
-                            if scan_insp is None:
-                                if await project_repo.is_scm_imported:
-                                    scan_insp = await self.__find_scan_for_repo_scan(sched.project_id, sched.branch)
-                                else:
-                                    scan_insp = ScanInspector(scan_response.json())
-                            else:
-                                scan_insp = await ScanLoader.load(self.__client, scan_insp.scan_id)
-
-                            if scan_insp is not None:
-                                ScanExecutor.log().debug(f"Throttler monitoring scan {scan_insp.scan_id} for {safe_name}")
-
-                                if not scan_insp.executing:
-                                    ScanExecutor.log().debug("Scan %s is complete, exiting throttle loop after %d seconds.", scan_insp.scan_id, (datetime.now() - timeout_check).seconds)
-                                    break
-
-                                if await self.__check_source_fetch_complete(scan_insp.scan_id):
-                                    ScanExecutor.log().debug("Scan %s indicates source fetch is complete, exiting throttle loop after %d seconds.", 
-                                                scan_insp.scan_id, (datetime.now() - timeout_check).seconds)
-                                    break
-
-                            else:
-                                ScanExecutor.log().debug(f"Running scan not found for {safe_name}")
-
-                            await asyncio.sleep(ScanExecutor.__CHECK_DELAY_S)
-                        
-                        if overtime:
-                            ScanExecutor.log().warning(f"Throttle loop is exiting after source fetch timeout for {safe_name}")
+                    priority.succeeded(sched.project_id)
                 else:
-                    ScanExecutor.log().error(f"Failed to start scan for project {safe_name}: {scan_response.status_code}:{scan_response.json()}")
-
+                    priority.missed(sched.project_id)
+
+            if scan_response.ok:
+                ScanExecutor.log().info(f"Scanning {safe_name}")
+
+                if get_fetch_throttle() and throttle is not None:
+                    scan_id = None if await project_repo.is_scm_imported else scan_response.json()['id']
+                    with profiling.waiting():
+                        tracked = await throttle.wait(sched.project_id, sched.branch, scan_id, safe_name, get_fetch_timeout_config())
+                    metrics.THROTTLE_WAIT.observe(tracked.elapsed, reason=tracked.reason)
+
+                    if adaptive is not None:
+                        adaptive.fetch_observed(tracked.elapsed, tracked.reason == "timeout")
+
+                    if tracked.reason == "timeout":
+                        ScanExecutor.log().warning(f"Throttle loop is exiting after source fetch timeout for {safe_name}")
+                    elif tracked.reason == "complete":
+                        ScanExecutor.log().debug("Scan %s is complete, exiting throttle loop after %d seconds.", tracked.scan_id, tracked.elapsed)
+                    else:
+                        ScanExecutor.log().debug("Scan %s indicates source fetch is complete, exiting throttle loop after %d seconds.", 
+                                    tracked.scan_id, tracked.elapsed)
+                return "submitted"
             else:
-                ScanExecutor.log().warning(f"Scheduled scan for {safe_name} skipped.")
+                ScanExecutor.log().error(f"Failed to start scan for project {safe_name}: {scan_response.status_code}:{scan_response.json()}")
 
-        except Exception as ex:
-            ScanExecutor.log().exception(ex)
+        else:
+            ScanExecutor.log().warning(f"Scheduled scan for {safe_name} skipped.")
+            return "skipped"
+
+    except Exception as ex:
+        ScanExecutor.log().exception(ex)
+
+    return "failed"
 
   @staticmethod
   def __create_name(project_name, project_id, repo_url, branch):
@@ -100,7 +164,12 @@ class ScanExecutor:
 
 
 
-  async def __should_scan(self, project_repo : ProjectRepoConfig, branch : str) -> bool:
+  async def __should_scan(self, project_repo : ProjectRepoConfig, branch : str, fire_status : ProjectFireStatus = None) -> bool:
+      if fire_status is not None and fire_status.fresh:
+          if fire_status.running(branch, await project_repo.is_scm_imported):
+              return False
+          return not (get_recent_scan_hours_config() > 0 and fire_status.recently_completed(branch))
+
       running_scan = False
 
       if not await project_repo.is_scm_imported:
@@ -116,6 +185,11 @@ class ScanExecutor:
           if project_repo.project_id in json_on_ok(potential_running_scan).keys() or project_repo.project_id in json_on_ok(potential_queued_scan).keys():
               running_scan = True
       
+      if not running_scan and get_recent_scan_hours_config() > 0 and self.__recent is not None:
+          recently_completed = await self.__recent.completed(project_repo.project_id, branch)
+          if recently_completed is not None:
+              return not recently_completed
+
       if not running_scan and get_recent_scan_hours_config() > 0:
           previous_time = datetime.now(timezone.utc) - timedelta(hours=get_recent_scan_hours_config())
 
@@ -125,51 +199,3 @@ class ScanExecutor:
               return False
 
       return not running_scan
-
-
-  async def __find_scan_for_repo_scan(self, projectid : str, branch : str) -> Union[ScanInspector, None]:
-      running, queued = await self.__get_latest_running_scan(projectid, branch)
-
-      if running.ok and len(running.json()) > 0:
-          json = json_on_ok(running)
-      elif queued.ok and len(queued.json()) > 0:
-          json = json_on_ok(queued)
-      else:
-          return None
-      
-      return ScanInspector(json[list(json.keys()).pop()])
-
-  async def __check_source_fetch_complete(self, scanid : str) -> bool:
-      workflow = json_on_ok(await retrieve_scan_workflow(self.__client, scanid))
-
-      fetch_start = False
-      fetch_complete = False
-
-      # Use some logic when reviewing the workflow to understand if the
-      # source fetch has completed.
-
-      for entry in workflow:
-          source = entry.get("Source", None)
-          info = entry.get("Info", None)
-
-          if source is None or info is None:
-              continue
-
-          if source == "fetch-sources-nv":
-              if info.startswith("fetch-sources-nv started"):
-                  fetch_start = True
-              elif info.startswith("fetch-sources-nv ended"):
-                  fetch_complete = True
-              elif info.startswith("fetch-sources-nv Err"):
-                  fetch_complete = True
-          elif source == "config-as-code-nv":
-              if info.startswith("config-as-code-nv started"):
-                  fetch_complete = True
-          elif source == "scans":
-              if info.startswith("Scan Failed"):
-                  fetch_complete = True
-
-          if fetch_start and fetch_complete:
-              return True
-
-      return False
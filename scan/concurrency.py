@@ -0,0 +1,90 @@
+import asyncio, logging
+from cxone_api import CxOneClient
+from cxone_api.util import json_on_ok
+from cxone_api.low.scans import retrieve_list_of_scans
+from .queue import PrioritySlots
+from time import monotonic
+
+
+class AdaptiveConcurrency(PrioritySlots):
+    __DECREASE_FACTOR = 0.5
+    # Several failures from the same burst should only cause one decrease.
+    __DECREASE_COOLDOWN_S = 30
+    __QUEUE_POLL_S = 60
+
+    @classmethod
+    def log(clazz):
+        return logging.getLogger("AdaptiveConcurrency")
+
+    def __init__(self, client : CxOneClient, max_limit : int, fetch_target_seconds : int, max_queued : int):
+        self.__max_limit = max(1, max_limit)
+        super().__init__(max(1, self.__max_limit // 2))
+        self.__client = client
+        self.__fetch_target = fetch_target_seconds
+        self.__max_queued = max_queued
+        self.__credit = 0.0
+        self.__last_decrease = 0.0
+        self.__queue_congested = False
+        self.__queue_task = None
+
+    @property
+    def max_limit(self) -> int:
+        return self.__max_limit
+
+    def start(self) -> None:
+        if self.__max_queued > 0 and self.__queue_task is None:
+            self.__queue_task = asyncio.create_task(self.__poll_queue())
+
+    def __set_limit(self, limit : int, reason : str) -> None:
+        limit = min(self.__max_limit, max(1, limit))
+        if limit != self.limit:
+            AdaptiveConcurrency.log().info(f"Effective scan submission concurrency changed from {self.limit} to {limit}: {reason}")
+            self._set_limit(limit)
+
+    def __increase(self, reason : str) -> None:
+        if self.__queue_congested:
+            return
+
+        # Additive increase: one more slot after a full window of good results.
+        self.__credit += 1.0 / self.limit
+        if self.__credit >= 1.0:
+            self.__credit = 0.0
+            self.__set_limit(self.limit + 1, reason)
+
+    def __decrease(self, reason : str) -> None:
+        now = monotonic()
+        if now - self.__last_decrease < AdaptiveConcurrency.__DECREASE_COOLDOWN_S:
+            return
+        self.__last_decrease = now
+        self.__credit = 0.0
+        self.__set_limit(int(self.limit * AdaptiveConcurrency.__DECREASE_FACTOR), reason)
+
+    def fetch_observed(self, seconds : float, timed_out : bool) -> None:
+        if timed_out:
+            self.__decrease("source fetch timed out")
+        elif seconds > self.__fetch_target:
+            self.__decrease(f"source fetch took {int(seconds)} seconds")
+        else:
+            self.__increase("source fetch within target")
+
+    def submission_succeeded(self) -> None:
+        self.__increase("scan submitted")
+
+    def submission_failed(self) -> None:
+        self.__decrease("scan submission failed")
+
+    async def __poll_queue(self) -> None:
+        while True:
+            try:
+                queued = json_on_ok(await retrieve_list_of_scans(self.__client, statuses=['Queued'], limit=1))
+                if queued is not None:
+                    count = int(queued['filteredTotalCount'])
+                    self.__queue_congested = count > self.__max_queued
+                    if self.__queue_congested:
+                        self.__decrease(f"{count} scans are queued")
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                AdaptiveConcurrency.log().exception(ex)
+
+            await asyncio.sleep(AdaptiveConcurrency.__QUEUE_POLL_S)
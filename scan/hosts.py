@@ -0,0 +1,45 @@
+import logging
+from contextlib import asynccontextmanager, nullcontext
+from fnmatch import fnmatch
+from utils import get_repo_host
+from .queue import PrioritySlots
+from typing import Callable, List, Tuple
+
+
+class HostConcurrency:
+
+    @classmethod
+    def log(clazz):
+        return logging.getLogger("HostConcurrency")
+
+    def __init__(self, host_limits : List[Tuple[str, int]], default_limit : int):
+        self.__host_limits = host_limits
+        self.__default_limit = default_limit
+        self.__semaphores = {}
+
+    def limit_for(self, host : str) -> int:
+        for pattern, limit in self.__host_limits:
+            if fnmatch(host, pattern):
+                return limit
+        return self.__default_limit
+
+    def __semaphore(self, host : str):
+        if host not in self.__semaphores.keys():
+            limit = self.limit_for(host)
+            # A limit of 0 leaves the host ungated.  Waiters for a host are served in the same priority
+            # order as the submission threads.
+            self.__semaphores[host] = PrioritySlots(limit) if limit > 0 else None
+            HostConcurrency.log().debug(f"Concurrency limit for SCM host [{host}]: {limit if limit > 0 else 'unlimited'}")
+        return self.__semaphores[host]
+
+    @asynccontextmanager
+    async def slot(self, repo_url : str, priority : Tuple = None, owner : str = None):
+        host = get_repo_host(repo_url)
+        semaphore = self.__semaphore(host) if host is not None else None
+        async with semaphore.slot(priority, owner) if semaphore is not None else nullcontext():
+            yield host
+
+    def reprioritize(self, owner : str, change : Callable[[Tuple], Tuple]) -> None:
+        for semaphore in self.__semaphores.values():
+            if semaphore is not None:
+                semaphore.reprioritize(owner, change)
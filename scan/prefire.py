@@ -0,0 +1,125 @@
+import asyncio, logging
+from cxone_api import CxOneClient
+from cxone_api.util import page_generator
+from cxone_api.low.scans import retrieve_list_of_scans
+from utils import get_recent_scan_hours_config
+from .recent import RecentScanIndex
+from datetime import datetime, timedelta, timezone
+from time import monotonic
+from typing import Dict, List, Union
+
+
+class ProjectFireStatus:
+    # An answer older than this is not trusted; the executor checks the project itself.
+    __MAX_AGE_S = 300
+
+    def __init__(self, checked_at : float):
+        self.__checked_at = checked_at
+        self.__active = []
+        self.__recent_branches = set()
+
+    def add_active(self, branch : str, scheduled : bool):
+        self.__active.append((branch, scheduled))
+
+    def add_recent(self, branch : str):
+        self.__recent_branches.add(branch)
+
+    @property
+    def fresh(self) -> bool:
+        return (monotonic() - self.__checked_at) < ProjectFireStatus.__MAX_AGE_S
+
+    def running(self, branch : str, is_imported : bool) -> bool:
+        # Scans can't be tagged at submission for projects imported from an SCM, so any running
+        # scan on the branch counts.
+        for active_branch, scheduled in self.__active:
+            if active_branch == branch and (scheduled or is_imported):
+                return True
+        return False
+
+    def recently_completed(self, branch : str) -> bool:
+        return branch in self.__recent_branches
+
+
+class _FireBatch:
+    def __init__(self):
+        self.project_ids = set()
+        self.result = asyncio.get_running_loop().create_future()
+
+
+class PreFireChecks:
+    # Jobs for the same trigger that fire within this window share one batch.
+    __COLLECT_S = 1.0
+    __PROJECTS_PER_QUERY = 100
+    __PAGE_SIZE = 100
+
+    @classmethod
+    def log(clazz):
+        return logging.getLogger("PreFireChecks")
+
+    def __init__(self, client : CxOneClient, recent : RecentScanIndex = None):
+        self.__client = client
+        self.__recent = recent
+        self.__batches = {}
+
+    async def status(self, trigger_key : str, project_id : str) -> Union[ProjectFireStatus, None]:
+        batch = self.__batches.get(trigger_key, None)
+        if batch is None:
+            batch = _FireBatch()
+            self.__batches[trigger_key] = batch
+            asyncio.create_task(self.__run(trigger_key, batch))
+
+        batch.project_ids.add(project_id)
+        statuses = await asyncio.shield(batch.result)
+        return statuses.get(project_id, None)
+
+    async def __run(self, trigger_key : str, batch : _FireBatch):
+        await asyncio.sleep(PreFireChecks.__COLLECT_S)
+        # Anything that fires after this point starts a new batch.
+        del self.__batches[trigger_key]
+
+        try:
+            statuses = await self.__query(sorted(batch.project_ids))
+            PreFireChecks.log().debug(f"Checked {len(batch.project_ids)} projects for trigger [{trigger_key}]")
+            batch.result.set_result(statuses)
+        except Exception as ex:
+            # Executors fall back to checking their own project.
+            PreFireChecks.log().error(f"Batched check for trigger [{trigger_key}] failed, projects will be checked individually.")
+            PreFireChecks.log().exception(ex)
+            batch.result.set_result({})
+
+    async def __apply_recent_index(self, statuses : Dict[str, ProjectFireStatus]) -> bool:
+        if self.__recent is None:
+            return False
+
+        for pid, status in statuses.items():
+            branches = await self.__recent.branches(pid)
+            if branches is None:
+                return False
+            for branch in branches:
+                status.add_recent(branch)
+
+        return True
+
+    async def __query(self, project_ids : List[str]) -> Dict[str, ProjectFireStatus]:
+        checked_at = monotonic()
+        statuses = {pid : ProjectFireStatus(checked_at) for pid in project_ids}
+
+        recent_from = None
+        if get_recent_scan_hours_config() > 0 and not await self.__apply_recent_index(statuses):
+            recent_from = (datetime.now(timezone.utc) - timedelta(hours=get_recent_scan_hours_config())).isoformat()
+
+        for index in range(0, len(project_ids), PreFireChecks.__PROJECTS_PER_QUERY):
+            chunk = project_ids[index:index + PreFireChecks.__PROJECTS_PER_QUERY]
+
+            async for scan in page_generator(retrieve_list_of_scans, "scans", client=self.__client, limit=PreFireChecks.__PAGE_SIZE, 
+                                             project_ids=chunk, statuses=['Queued', 'Running']):
+                if scan['projectId'] in statuses.keys():
+                    statuses[scan['projectId']].add_active(scan.get('branch', None), "scheduled" in (scan.get('tags', None) or {}).keys())
+
+            if recent_from is not None:
+                async for scan in page_generator(retrieve_list_of_scans, "scans", client=self.__client, limit=PreFireChecks.__PAGE_SIZE, 
+                                                 project_ids=chunk, statuses=['Completed'], from_date=recent_from):
+                    if scan['projectId'] in statuses.keys():
+                        statuses[scan['projectId']].add_recent(scan.get('branch', None))
+
+        return statuses
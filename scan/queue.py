@@ -0,0 +1,135 @@
+import asyncio, heapq, itertools, logging
+from contextlib import asynccontextmanager
+from time import monotonic, time
+from utils import PolicyRegistry
+from typing import Callable, Tuple
+
+
+class PrioritySlots:
+    # Waiters without a priority are served after any prioritized waiter, in arrival order.  Waiters
+    # with equal priority are also served in arrival order.
+    LOWEST = (2, 0.0)
+
+    def __init__(self, limit : int):
+        self.__limit = max(1, limit)
+        self.__in_use = 0
+        self.__waiters = []
+        self.__sequence = itertools.count()
+
+    @property
+    def limit(self) -> int:
+        return self.__limit
+
+    def _set_limit(self, limit : int) -> None:
+        self.__limit = max(1, limit)
+        self.__wake()
+
+    @property
+    def in_use(self) -> int:
+        return self.__in_use
+
+    @property
+    def depth(self) -> int:
+        return len([w for w in self.__waiters if not w[3].done()])
+
+    @property
+    def oldest_wait_seconds(self) -> float:
+        now = monotonic()
+        return max([now - w[2] for w in self.__waiters if not w[3].done()], default=0.0)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    @asynccontextmanager
+    async def slot(self, priority : Tuple = None, owner : str = None):
+        await self.acquire(priority, owner)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    async def acquire(self, priority : Tuple = None, owner : str = None) -> None:
+        if self.__in_use < self.__limit and len(self.__waiters) == 0:
+            self.__in_use += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.__waiters, (priority if priority is not None else PrioritySlots.LOWEST, 
+                                        next(self.__sequence), monotonic(), waiter, owner))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over as this waiter was cancelled.
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+
+    def release(self) -> None:
+        self.__in_use -= 1
+        self.__wake()
+
+    def reprioritize(self, owner : str, change : Callable[[Tuple], Tuple]) -> None:
+        # Waiters keep their place among waiters of the same new priority.
+        changed = False
+        for index, (priority, sequence, queued, waiter, waiter_owner) in enumerate(self.__waiters):
+            if waiter_owner == owner and priority != PrioritySlots.LOWEST and not waiter.done():
+                self.__waiters[index] = (change(priority), sequence, queued, waiter, waiter_owner)
+                changed = True
+        if changed:
+            heapq.heapify(self.__waiters)
+
+    def __wake(self) -> None:
+        while self.__in_use < self.__limit and len(self.__waiters) > 0:
+            _, _, _, waiter, _ = heapq.heappop(self.__waiters)
+            if not waiter.done():
+                self.__in_use += 1
+                waiter.set_result(True)
+
+
+class SubmissionPriority:
+    __MISSED = 0
+    __NORMAL = 1
+
+    @classmethod
+    def log(clazz):
+        return logging.getLogger("SubmissionPriority")
+
+    def __init__(self, policies : PolicyRegistry):
+        self.__policies = policies
+        self.__started = time()
+        self.__last_success = {}
+        self.__missed = set()
+        self.__slots = []
+
+    def watch(self, slots) -> None:
+        # Waiting scans of a project that misses its window are moved ahead in these slots.
+        self.__slots.append(slots)
+
+    def priority(self, project_id : str, crontab : str) -> Tuple:
+        # Projects that missed a window go first, then the oldest successful scheduled scan.  Projects
+        # never scanned by this process go first.  The key does not depend on when the scan was queued,
+        # so waiters with the same key are served in arrival order.
+        last_success = self.__last_success.get(project_id, None)
+        since_start = float('-inf') if last_success is None else (last_success - self.__started) / self.__policies.weight(crontab)
+        return (SubmissionPriority.__MISSED if project_id in self.__missed else SubmissionPriority.__NORMAL, since_start)
+
+    def succeeded(self, project_id : str) -> None:
+        self.__last_success[project_id] = time()
+        self.__missed.discard(project_id)
+
+    def missed(self, project_id : str) -> None:
+        if project_id not in self.__missed:
+            SubmissionPriority.log().debug(f"Project {project_id} missed its scheduled scan, it will be prioritized in the next window")
+        self.__missed.add(project_id)
+        for slots in self.__slots:
+            slots.reprioritize(project_id, lambda priority: (SubmissionPriority.__MISSED,) + tuple(priority[1:]))
+
+    def forget(self, project_id : str) -> None:
+        self.__last_success.pop(project_id, None)
+        self.__missed.discard(project_id)
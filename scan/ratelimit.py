@@ -0,0 +1,57 @@
+import asyncio, logging
+from time import monotonic
+
+
+class SubmissionRateLimiter:
+    # Each successful submission after a slowdown recovers this fraction of the configured rate.
+    __RECOVERY_FRACTION = 0.05
+    # The fill rate is never reduced below this fraction of the configured rate.
+    __MIN_RATE_FRACTION = 0.05
+
+    @classmethod
+    def log(clazz):
+        return logging.getLogger("SubmissionRateLimiter")
+
+    def __init__(self, scans_per_minute : int, burst : int):
+        self.__max_rate = scans_per_minute / 60.0
+        self.__rate = self.__max_rate
+        self.__burst = max(1, burst)
+        self.__tokens = float(self.__burst)
+        self.__last_fill = monotonic()
+        self.__lock = asyncio.Lock()
+
+    @property
+    def scans_per_minute(self) -> float:
+        return self.__rate * 60.0
+
+    def __fill(self):
+        now = monotonic()
+        self.__tokens = min(self.__burst, self.__tokens + ((now - self.__last_fill) * self.__rate))
+        self.__last_fill = now
+
+    async def acquire(self) -> None:
+        # The lock keeps waiters in arrival order.
+        async with self.__lock:
+            while True:
+                self.__fill()
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.__tokens) / self.__rate)
+
+    def throttled(self) -> None:
+        self.__fill()
+        self.__rate = max(self.__max_rate * SubmissionRateLimiter.__MIN_RATE_FRACTION, self.__rate / 2)
+        SubmissionRateLimiter.log().warning(f"Scan submission rate reduced to {self.scans_per_minute:.2f} scans per minute")
+
+    def succeeded(self) -> None:
+        if self.__rate < self.__max_rate:
+            self.__fill()
+            self.__rate = min(self.__max_rate, self.__rate + (self.__max_rate * SubmissionRateLimiter.__RECOVERY_FRACTION))
+            SubmissionRateLimiter.log().debug(f"Scan submission rate increased to {self.scans_per_minute:.2f} scans per minute")
+
+    def feedback(self, status_code : int) -> None:
+        if status_code == 429 or status_code >= 500:
+            self.throttled()
+        elif status_code < 400:
+            self.succeeded()
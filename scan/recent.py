@@ -0,0 +1,70 @@
+import asyncio, logging
+from cxone_api import CxOneClient
+from cxone_api.util import page_generator
+from cxone_api.low.scans import retrieve_list_of_scans
+from datetime import datetime, timedelta, timezone
+from time import monotonic, perf_counter
+from typing import Dict, Set, Union
+
+
+class RecentScanIndex:
+    # Completed scans for the whole tenant since the RECENT_SCAN_HOURS cutoff, loaded once for
+    # all the projects that fire together instead of one query per project.  The index is reused
+    # until it is max_age_seconds old.
+    __PAGE_SIZE = 500
+
+    @classmethod
+    def log(clazz):
+        return logging.getLogger("RecentScanIndex")
+
+    def __init__(self, client : CxOneClient, hours : int, max_age_seconds : int):
+        self.__client = client
+        self.__hours = hours
+        self.__max_age = max_age_seconds
+        self.__index = None
+        self.__loaded_at = None
+        self.__lock = asyncio.Lock()
+
+    async def __load(self) -> Dict[str, Set[str]]:
+        load_start = perf_counter()
+        from_date = (datetime.now(timezone.utc) - timedelta(hours=self.__hours)).isoformat()
+        index = {}
+        count = 0
+
+        async for scan in page_generator(retrieve_list_of_scans, "scans", client=self.__client, limit=RecentScanIndex.__PAGE_SIZE, 
+                                         statuses=['Completed'], from_date=from_date):
+            index.setdefault(scan['projectId'], set()).add(scan.get('branch', None))
+            count += 1
+
+        RecentScanIndex.log().debug(f"Loaded {count} completed scans for {len(index)} projects in {perf_counter() - load_start:.2f}s")
+        return index
+
+    async def __current(self) -> Union[Dict[str, Set[str]], None]:
+        if self.__loaded_at is not None and monotonic() - self.__loaded_at < self.__max_age:
+            return self.__index
+
+        # Executors that fire together wait for the same load.
+        async with self.__lock:
+            if self.__loaded_at is None or monotonic() - self.__loaded_at >= self.__max_age:
+                try:
+                    self.__index = await self.__load()
+                except Exception as ex:
+                    RecentScanIndex.log().error("Loading recently completed scans failed, projects will be checked individually.")
+                    RecentScanIndex.log().exception(ex)
+                    self.__index = None
+                self.__loaded_at = monotonic()
+
+        return self.__index
+
+    async def branches(self, project_id : str) -> Union[Set[str], None]:
+        # None when the index could not be loaded.
+        index = await self.__current()
+        if index is None:
+            return None
+        return index.get(project_id, set())
+
+    async def completed(self, project_id : str, branch : str) -> Union[bool, None]:
+        branches = await self.branches(project_id)
+        if branches is None:
+            return None
+        return branch in branches
@@ -0,0 +1,45 @@
+import logging
+from collections import OrderedDict
+from cxone_api.high.projects import ProjectRepoConfig
+from time import monotonic
+from typing import Union
+
+
+class RepoConfigCache:
+    # Repository configuration resolved during the crawl, reused when the project's scans fire.
+    # Entries expire after ttl_seconds; the least recently used entries are dropped above max_entries.
+
+    @classmethod
+    def log(clazz):
+        return logging.getLogger("RepoConfigCache")
+
+    def __init__(self, ttl_seconds : int, max_entries : int):
+        self.__ttl = ttl_seconds
+        self.__max_entries = max(1, max_entries)
+        self.__entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, project_id : str) -> Union[ProjectRepoConfig, None]:
+        entry = self.__entries.get(project_id, None)
+        if entry is None:
+            return None
+
+        stored_at, repo_config = entry
+        if monotonic() - stored_at >= self.__ttl:
+            del self.__entries[project_id]
+            return None
+
+        self.__entries.move_to_end(project_id)
+        return repo_config
+
+    def put(self, project_id : str, repo_config : ProjectRepoConfig) -> None:
+        self.__entries[project_id] = (monotonic(), repo_config)
+        self.__entries.move_to_end(project_id)
+
+        while len(self.__entries) > self.__max_entries:
+            self.__entries.popitem(last=False)
+
+    def invalidate(self, project_id : str) -> None:
+        self.__entries.pop(project_id, None)
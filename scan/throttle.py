@@ -0,0 +1,182 @@
+import asyncio, logging
+from cxone_api import CxOneClient
+from cxone_api.util import page_generator, json_on_ok
+from cxone_api.low.scans import retrieve_list_of_scans, retrieve_scan_workflow
+from time import monotonic
+from typing import Dict, List, Union
+
+
+class _ThrottledScan:
+
+    def __init__(self, project_id : str, branch : str, scan_id : Union[str, None], safe_name : str, timeout : int):
+        self.project_id = project_id
+        self.branch = branch
+        self.scan_id = scan_id
+        self.safe_name = safe_name
+        self.started = monotonic()
+        self.deadline = self.started + timeout
+        self.released = asyncio.Event()
+        self.reason = None
+        self.status = None
+        self.workflow_seen = 0
+        self.fetch_start = False
+        self.fetch_complete = False
+
+    @property
+    def elapsed(self) -> float:
+        return monotonic() - self.started
+
+    def release(self, reason : str) -> None:
+        if not self.released.is_set():
+            self.reason = reason
+            self.released.set()
+
+
+class FetchThrottleMonitor:
+    __BATCH_SIZE = 100
+    __MAX_CONCURRENT_WORKFLOWS = 10
+
+    @classmethod
+    def log(clazz):
+        return logging.getLogger("FetchThrottleMonitor")
+
+    def __init__(self, client : CxOneClient, poll_seconds : int):
+        self.__client = client
+        self.__poll_seconds = poll_seconds
+        self.__tracked = []
+        self.__task = None
+        self.__wake = asyncio.Event()
+
+    @property
+    def tracked_scans(self) -> int:
+        return len(self.__tracked)
+
+    async def wait(self, project_id : str, branch : str, scan_id : Union[str, None], safe_name : str, timeout : int) -> _ThrottledScan:
+        # Scans for projects imported from an SCM have no scan id at submission, they are found by project and branch.
+        tracked = _ThrottledScan(project_id, branch, scan_id, safe_name, timeout)
+        idle = len(self.__tracked) == 0
+        self.__tracked.append(tracked)
+
+        # A new monitor polls immediately.  A monitor that is waiting with nothing tracked is woken;
+        # otherwise the scan joins the next scheduled poll.
+        if self.__task is None or self.__task.done():
+            self.__task = asyncio.create_task(self.__monitor())
+        elif idle:
+            self.__wake.set()
+
+        try:
+            await asyncio.wait_for(tracked.released.wait(), timeout=max(0, tracked.deadline - monotonic()))
+        except asyncio.TimeoutError:
+            tracked.release("timeout")
+        finally:
+            if tracked in self.__tracked:
+                self.__tracked.remove(tracked)
+
+        return tracked
+
+    async def __monitor(self):
+        while len(self.__tracked) > 0:
+            self.__wake.clear()
+            try:
+                await self.__poll(list(self.__tracked))
+            except Exception as ex:
+                FetchThrottleMonitor.log().exception(ex)
+
+            try:
+                await asyncio.wait_for(self.__wake.wait(), timeout=self.__poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def __poll(self, tracked : List[_ThrottledScan]):
+        now = monotonic()
+        for t in tracked:
+            if now >= t.deadline:
+                t.release("timeout")
+
+        await self.__find_missing_scan_ids([t for t in tracked if t.scan_id is None and not t.released.is_set()])
+
+        by_id = {t.scan_id : t for t in tracked if t.scan_id is not None and not t.released.is_set()}
+        await self.__load_statuses(by_id)
+
+        for t in by_id.values():
+            if t.status is not None and t.status not in ['Queued', 'Running']:
+                t.release("complete")
+
+        # Source fetch only happens once a scan is running; queued scans don't need their workflow checked.
+        running = [t for t in by_id.values() if t.status == 'Running' and not t.released.is_set()]
+        limit = asyncio.Semaphore(FetchThrottleMonitor.__MAX_CONCURRENT_WORKFLOWS)
+
+        async def check(t):
+            async with limit:
+                if await self.__check_source_fetch_complete(t):
+                    t.release("fetched")
+
+        await asyncio.gather(*[check(t) for t in running])
+
+    async def __find_missing_scan_ids(self, tracked : List[_ThrottledScan]):
+        if len(tracked) == 0:
+            return
+
+        by_project = {}
+        for t in tracked:
+            by_project.setdefault(t.project_id, []).append(t)
+
+        project_ids = list(by_project.keys())
+        for index in range(0, len(project_ids), FetchThrottleMonitor.__BATCH_SIZE):
+            async for scan in page_generator(retrieve_list_of_scans, "scans", client=self.__client, limit=FetchThrottleMonitor.__BATCH_SIZE,
+                                             project_ids=project_ids[index:index + FetchThrottleMonitor.__BATCH_SIZE], 
+                                             statuses=['Queued', 'Running']):
+                for t in by_project.get(scan['projectId'], []):
+                    if t.scan_id is None and t.branch == scan.get('branch', None):
+                        t.scan_id = scan['id']
+                        break
+
+        for t in tracked:
+            if t.scan_id is None:
+                FetchThrottleMonitor.log().debug(f"Running scan not found for {t.safe_name}")
+            else:
+                FetchThrottleMonitor.log().debug(f"Throttler monitoring scan {t.scan_id} for {t.safe_name}")
+
+    async def __load_statuses(self, by_id : Dict[str, _ThrottledScan]):
+        scan_ids = list(by_id.keys())
+        for index in range(0, len(scan_ids), FetchThrottleMonitor.__BATCH_SIZE):
+            async for scan in page_generator(retrieve_list_of_scans, "scans", client=self.__client, limit=FetchThrottleMonitor.__BATCH_SIZE,
+                                             scan_ids=scan_ids[index:index + FetchThrottleMonitor.__BATCH_SIZE]):
+                if scan['id'] in by_id.keys():
+                    by_id[scan['id']].status = scan.get('status', None)
+
+    async def __check_source_fetch_complete(self, tracked : _ThrottledScan) -> bool:
+        workflow = json_on_ok(await retrieve_scan_workflow(self.__client, tracked.scan_id))
+        if workflow is None:
+            return False
+
+        # Use some logic when reviewing the workflow to understand if the
+        # source fetch has completed.  Entries already reviewed in an earlier
+        # poll are skipped.
+
+        for entry in workflow[tracked.workflow_seen:]:
+            tracked.workflow_seen += 1
+            source = entry.get("Source", None)
+            info = entry.get("Info", None)
+
+            if source is None or info is None:
+                continue
+
+            if source == "fetch-sources-nv":
+                if info.startswith("fetch-sources-nv started"):
+                    tracked.fetch_start = True
+                elif info.startswith("fetch-sources-nv ended"):
+                    tracked.fetch_complete = True
+                elif info.startswith("fetch-sources-nv Err"):
+                    tracked.fetch_complete = True
+            elif source == "config-as-code-nv":
+                if info.startswith("config-as-code-nv started"):
+                    tracked.fetch_complete = True
+            elif source == "scans":
+                if info.startswith("Scan Failed"):
+                    tracked.fetch_complete = True
+
+            if tracked.fetch_start and tracked.fetch_complete:
+                return True
+
+        return False
@@ -2,21 +2,45 @@
 import sys, logging, utils
 from __agent__ import __agent__
 
-if sys.argv[0].lower().startswith("audit") or \
-    (len (sys.argv) > 1 and sys.argv[1] is not None and sys.argv[1].lower().startswith("audit")):
-    is_audit = True
+def invoked_as(command):
+    return sys.argv[0].lower().startswith(command) or \
+        (len (sys.argv) > 1 and sys.argv[1] is not None and sys.argv[1].lower().startswith(command))
+
+is_audit = invoked_as("audit")
+is_forecast = invoked_as("forecast")
+
+if is_audit or is_forecast:
     utils.configure_audit_logging()
 else:
-    is_audit = False
     utils.configure_normal_logging()
 
-import asyncio, time
+import asyncio, time, json, metrics
+from metrics import profiling
+from datetime import timedelta
 from cxone_api import CxOneClient
 from cxone_api.exceptions import CommunicationException
 from logic import Scheduler
+from logic.forecast import ScheduleForecast
+from scan import HostConcurrency
+from datetime import datetime
+from web import HttpServer, HttpResponse
+from web.refresh import ProjectRefreshHandler
 from utils import (get_api_timeout_config, 
                    get_api_retry_delay_config, 
-                   get_api_retries_config)
+                   get_api_retries_config,
+                   get_http_port_config,
+                   get_http_bind_config,
+                   get_refresh_endpoint,
+                   get_refresh_token,
+                   get_profile_path,
+                   get_profile_interval_ms_config,
+                   get_loop_lag_threshold_ms_config,
+                   get_shard_count_config,
+                   get_forecast_hours_config,
+                   get_forecast_limit_config,
+                   get_scm_default_limit_config,
+                   load_scm_host_limits,
+                   ShardAssignment)
 
 
 __log = logging.getLogger("scheduler daemon")
@@ -55,17 +79,59 @@ while True:
         update_delay = utils.load_schedule_update_delay()
         __log.debug(f"Update Delay: {update_delay}")
 
+        # Retrying does not help a pod that has no shard to own.
+        shard_error = utils.get_shard_config_error()
+        if shard_error is not None and not (is_audit or is_forecast):
+            __log.error(shard_error)
+            exit(1)
+
 
         __log.debug("Configuration loaded")
 
 
         async def scheduler():
-            the_scheduler = await Scheduler.start(client, default_schedule, group_schedules, policies)
+            if get_profile_path() is not None:
+                profiling.start(get_profile_path(), get_profile_interval_ms_config() / 1000, get_loop_lag_threshold_ms_config() / 1000)
+
+            http_server = None
+            refresh_handler = None
+            starting_scheduler = None
+
+            def initialized(sched):
+                nonlocal starting_scheduler
+                starting_scheduler = sched
+
+            if get_http_port_config() > 0:
+                metrics.instrument_client(client)
+
+                async def get_metrics(query, body, headers):
+                    return HttpResponse(200, metrics.REGISTRY.render(), "text/plain; version=0.0.4; charset=utf-8")
+
+                async def get_ready(query, body, headers):
+                    if starting_scheduler is None:
+                        return HttpResponse(503, json.dumps({"ready" : False}), "application/json")
+                    progress = starting_scheduler.startup_progress
+                    return HttpResponse(200 if progress['ready'] else 503, json.dumps(progress), "application/json")
+
+                http_server = HttpServer(get_http_bind_config(), get_http_port_config())
+                http_server.route("GET", "/metrics", get_metrics)
+                http_server.route("GET", "/ready", get_ready)
+                if get_refresh_endpoint():
+                    refresh_handler = ProjectRefreshHandler(get_refresh_token())
+                    http_server.route("POST", "/refresh", refresh_handler)
+                await http_server.start()
+
+            the_scheduler = await Scheduler.start(client, default_schedule, group_schedules, policies, initialized)
+            if refresh_handler is not None:
+                refresh_handler.scheduler = the_scheduler
 
             __log.info("Scheduler loop started")
             short_delay = False
             while True:
                 __log.info(f"Projects with scheduled scans: {the_scheduler.scheduled_scans}")
+                __log.info(f"Effective scan submission threads: {the_scheduler.effective_threads}")
+                __log.info(f"Scans waiting for submission: {the_scheduler.submission_queue_depth} " + 
+                           f"Oldest wait: {timedelta(seconds=int(the_scheduler.submission_queue_oldest_seconds))}")
 
                 try:
                     await asyncio.sleep(update_delay if not short_delay else 90)
@@ -74,9 +140,9 @@ while True:
 
                 __log.info("Updating schedule...")
                 try:
-                    new, removed, changed = await the_scheduler.refresh_schedule()
+                    diff = await the_scheduler.refresh_schedule()
                     short_delay = False
-                    __log.info(f"Schedule changes: New: {new} Removed: {removed} Changed: {changed}")
+                    __log.info(f"Schedule changes: {diff}")
                 except CommunicationException as ex:
                     __log.exception(ex)
                     short_delay = True
@@ -84,20 +150,33 @@ while True:
                     __log.exception(gex)
 
         async def audit():
-            print('"ProjectId","State","Details"')
+            # When sharded, the shard that schedules each project is added to the output.
+            shards = ShardAssignment(0, get_shard_count_config()) if get_shard_count_config() > 1 else None
+            shard_column = lambda project_id: f',"{shards.owner(project_id)}"' if shards is not None else ""
+
+            print('"ProjectId","State","Details"' + (',"Shard"' if shards is not None else ""))
 
             def skipped_entry_cb(project_id, reason):
-                print(f'"{project_id}","SKIPPED","{reason}"')
+                print(f'"{project_id}","SKIPPED","{reason}"' + shard_column(project_id))
 
             for entry in (await Scheduler.audit(client, default_schedule, group_schedules, policies, skipped_entry_cb)).values():
                 for sched in entry:
                     clean_sched = str(sched).replace("'", "")
-                    print(f'"{sched.project_id}","SCHEDULED","{clean_sched}"')
+                    print(f'"{sched.project_id}","SCHEDULED","{clean_sched}"' + shard_column(sched.project_id))
+
+        async def forecast():
+            schedule = await Scheduler.audit(client, default_schedule, group_schedules, policies, None)
+            forecaster = ScheduleForecast(policies, schedule, get_forecast_limit_config(), 
+                                          HostConcurrency(load_scm_host_limits(), get_scm_default_limit_config()))
+
+            print('"Minute","Policy","Host","Scans","MinuteTotal","HotSpot"')
+            for minute, policy, host, count, total, flags in forecaster.rows(datetime.now().astimezone(), get_forecast_hours_config()):
+                print(f'"{minute.isoformat()}","{policy}","{host}","{count}","{total}","{",".join(flags)}"')
 
-        if is_audit:
+        if is_audit or is_forecast:
             try:
                 audit_log = logging.getLogger("audit")
-                asyncio.run(audit())
+                asyncio.run(audit() if is_audit else forecast())
             except BaseException as ex:
                 audit_log.exception(ex)
             finally:
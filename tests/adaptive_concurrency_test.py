@@ -0,0 +1,74 @@
+import unittest, asyncio
+from scan.concurrency import AdaptiveConcurrency
+
+class TestAdaptiveConcurrency(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_starts_below_ceiling(self):
+        self.assertEqual(AdaptiveConcurrency(None, 10, 60, 0).limit, 5)
+
+    async def test_limit_bounds_concurrency(self):
+        ac = AdaptiveConcurrency(None, 4, 60, 0)
+        running = 0
+        peak = 0
+
+        async def work():
+            nonlocal running, peak
+            async with ac:
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*[work() for _ in range(20)])
+        self.assertTrue(peak == 2 and ac.in_use == 0)
+
+    def test_additive_increase(self):
+        ac = AdaptiveConcurrency(None, 10, 60, 0)
+        for _ in range(5):
+            ac.fetch_observed(1, False)
+        self.assertEqual(ac.limit, 6)
+
+    def test_increase_capped(self):
+        ac = AdaptiveConcurrency(None, 4, 60, 0)
+        for _ in range(100):
+            ac.submission_succeeded()
+        self.assertEqual(ac.limit, 4)
+
+    def test_multiplicative_decrease(self):
+        ac = AdaptiveConcurrency(None, 20, 60, 0)
+        ac.fetch_observed(1, True)
+        self.assertEqual(ac.limit, 5)
+
+    def test_slow_fetch_decreases(self):
+        ac = AdaptiveConcurrency(None, 20, 60, 0)
+        ac.fetch_observed(61, False)
+        self.assertEqual(ac.limit, 5)
+
+    def test_decrease_cooldown(self):
+        ac = AdaptiveConcurrency(None, 20, 60, 0)
+        ac.submission_failed()
+        ac.submission_failed()
+        self.assertEqual(ac.limit, 5)
+
+    def test_never_below_one(self):
+        ac = AdaptiveConcurrency(None, 1, 60, 0)
+        ac.submission_failed()
+        self.assertEqual(ac.limit, 1)
+
+    async def test_increase_wakes_waiter(self):
+        ac = AdaptiveConcurrency(None, 4, 60, 0)
+        await ac.acquire()
+        await ac.acquire()
+        waiter = asyncio.create_task(ac.acquire())
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+        for _ in range(2):
+            ac.submission_succeeded()
+        await asyncio.sleep(0)
+        self.assertTrue(waiter.done() and ac.in_use == 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest, os
+from unittest import mock
+from logic import Scheduler
+from utils import GroupSchedules, load_policies
+from cxone_api import CxOneClient, CxOneAuthEndpoint, CxOneApiEndpoint
+from benchmarks.tenant import SyntheticTenant
+from benchmarks.mockapi import MockCxOneApi
+from benchmarks.fire import fire_all
+
+
+class _Client:
+    pass
+
+
+class TestMockApi(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def setUp(self):
+        self.tenant = SyntheticTenant(250, seed=1)
+        self.api = MockCxOneApi(self.tenant, fetch_seconds=0, queue_seconds=0)
+        self.client = _Client()
+        self.api.attach(self.client)
+
+    def test_tenant_is_repeatable(self):
+        self.assertEqual(list(SyntheticTenant(250, seed=1).projects.keys()), list(self.tenant.projects.keys()))
+
+    async def test_project_paging(self):
+        seen = []
+        for offset in range(0, 300, 100):
+            page = (await self.client.get("https://bench.invalid/api/projects", params={"offset" : offset, "limit" : 100})).json()
+            seen += [p['id'] for p in page['projects']]
+        self.assertEqual(seen, list(self.tenant.projects.keys()))
+
+    async def test_project_filters(self):
+        tagged = (await self.client.get("https://bench.invalid/api/projects", params={"tags-keys" : "schedule", "limit" : 1000})).json()
+        self.assertEqual(tagged['filteredTotalCount'], len([p for p in self.tenant.projects.values() if "schedule" in p['tags']]))
+
+        pid = list(self.tenant.projects.keys())[5]
+        by_id = (await self.client.get("https://bench.invalid/api/projects", params={"ids" : [pid]})).json()
+        self.assertEqual([p['id'] for p in by_id['projects']], [pid])
+
+    async def test_scan_lifecycle(self):
+        pid = list(self.tenant.projects.keys())[0]
+        response = await self.client.post("https://bench.invalid/api/scans", json={"project" : {"id" : pid}, "handler" : {"branch" : "main"}})
+        self.assertEqual(response.status_code, 201)
+        scan_id = response.json()['id']
+
+        scans = (await self.client.get("https://bench.invalid/api/scans", params={"scan-ids" : [scan_id]})).json()
+        self.assertEqual(scans['scans'][0]['status'], "Completed")
+        workflow = (await self.client.get(f"https://bench.invalid/api/scans/{scan_id}/workflow")).json()
+        self.assertTrue(workflow[-1]['Info'].startswith("fetch-sources-nv ended"))
+        self.assertEqual(self.api.submitted_scans, 1)
+
+    async def test_unrouted_and_errors(self):
+        self.assertEqual((await self.client.get("https://bench.invalid/api/nothing")).status_code, 404)
+        self.assertEqual(len(self.api.unrouted), 1)
+
+        failing = MockCxOneApi(self.tenant, error_rate=1)
+        failing.attach(self.client)
+        self.assertEqual((await self.client.get("https://bench.invalid/api/projects")).status_code, 503)
+        self.assertEqual(failing.errors, 1)
+
+
+class TestFireAll(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    async def __fire(self, env):
+        tenant = SyntheticTenant(40, seed=2)
+        api = MockCxOneApi(tenant, fetch_seconds=0, queue_seconds=0)
+        client = CxOneClient.create_with_oauth("bench", "bench", "bench", CxOneAuthEndpoint("bench", "bench.invalid"),
+                                               CxOneApiEndpoint("bench.invalid"))
+        api.attach(client)
+
+        with mock.patch.dict(os.environ, {k : v for k, v in os.environ.items() if k in ["PATH", "HOME"]} | env, clear=True):
+            scheduler = await Scheduler.start(client, "daily", GroupSchedules(), load_policies())
+            fired = await fire_all(scheduler)
+        return fired, api.submitted_scans, scheduler.scheduled_scans
+
+    async def test_project_jobs(self):
+        fired, submitted, scheduled = await self.__fire({})
+        self.assertEqual((fired, submitted), (scheduled, scheduled))
+
+    async def test_trigger_dispatch(self):
+        fired, submitted, scheduled = await self.__fire({"DISPATCH_BY_TRIGGER" : "true"})
+        self.assertLess(fired, scheduled)
+        self.assertEqual(submitted, scheduled)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from logic.crawl import CrawlPlanner
+from cxone_api import CxOneClient, CxOneAuthEndpoint, CxOneApiEndpoint
+from benchmarks.tenant import SyntheticTenant
+from benchmarks.mockapi import MockCxOneApi
+
+
+class TestCrawlPlanner(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_default_schedule_crawls_everything(self):
+        self.assertEqual(CrawlPlanner("daily", ["g1", "g2"]).queries, [{}])
+
+    def test_tags_only(self):
+        self.assertEqual(CrawlPlanner(None, []).queries, [{'tags_keys' : 'schedule'}])
+
+    def test_groups(self):
+        self.assertEqual(CrawlPlanner(None, ["g2", "g1"]).queries,
+                         [{'tags_keys' : 'schedule'}, {'groups' : ["g1"]}, {'groups' : ["g2"]}])
+
+
+class TestCrawlPaging(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def setUp(self):
+        self.tenant = SyntheticTenant(95, seed=3)
+        self.api = MockCxOneApi(self.tenant, fetch_seconds=0, queue_seconds=0)
+        self.client = CxOneClient.create_with_oauth("test", "test", "test", CxOneAuthEndpoint("test", "test.invalid"), 
+                                                    CxOneApiEndpoint("test.invalid"))
+        self.api.attach(self.client)
+
+    async def __crawl(self, planner, page_size, page_concurrency):
+        return [p['id'] async for p in planner.projects(self.client, page_size, page_concurrency)]
+
+    async def test_concurrent_pages(self):
+        for page_size, page_concurrency in [(100, 1), (10, 1), (10, 4), (7, 20), (95, 3)]:
+            ids = await self.__crawl(CrawlPlanner("daily", []), page_size, page_concurrency)
+            self.assertEqual(len(ids), len(set(ids)))
+            self.assertEqual(set(ids), set(self.tenant.projects.keys()))
+
+    async def test_merged_queries(self):
+        group_ids = [g['id'] for g in self.tenant.groups]
+        ids = await self.__crawl(CrawlPlanner(None, group_ids), 10, 4)
+        expected = {p['id'] for p in self.tenant.projects.values() if "schedule" in p['tags'] or len(set(group_ids) & set(p['groups'])) > 0}
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest, asyncio
+from scan.throttle import FetchThrottleMonitor
+from cxone_api import CxOneClient, CxOneAuthEndpoint, CxOneApiEndpoint
+from benchmarks.tenant import SyntheticTenant
+from benchmarks.mockapi import MockCxOneApi
+
+
+class TestFetchThrottleMonitor(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def setUp(self):
+        self.tenant = SyntheticTenant(10, seed=4)
+        self.api = MockCxOneApi(self.tenant, queue_seconds=0, fetch_seconds=0.5)
+        self.client = CxOneClient.create_with_oauth("test", "test", "test", CxOneAuthEndpoint("test", "test.invalid"),
+                                                    CxOneApiEndpoint("test.invalid"))
+        self.api.attach(self.client)
+
+    async def __submit(self, project):
+        return (await self.client.post("https://test.invalid/api/scans", json={"project" : {"id" : project['id']}})).json()['id']
+
+    def __calls(self, suffix):
+        return sum([count for label, count in self.api.calls.items() if label.startswith("GET") and label.endswith(suffix)])
+
+    async def test_poll_cadence(self):
+        monitor = FetchThrottleMonitor(self.client, 0.3)
+        polls = []
+        poll = monitor._FetchThrottleMonitor__poll
+
+        async def counted_poll(tracked):
+            polls.append(len(tracked))
+            await poll(tracked)
+
+        monitor._FetchThrottleMonitor__poll = counted_poll
+        waits = []
+        for project in list(self.tenant.projects.values())[:5]:
+            scan_id = await self.__submit(project)
+            waits.append(asyncio.create_task(monitor.wait(project['id'], project['mainBranch'], scan_id, project['name'], 10)))
+            await asyncio.sleep(0.05)
+
+        results = await asyncio.gather(*waits)
+        self.assertEqual([r.reason for r in results], ["fetched"] * 5)
+
+        # Scans registered while the monitor is active join its next poll instead of triggering another.
+        self.assertLessEqual(len(polls), 5)
+        self.assertEqual(polls[0], 1)
+        self.assertEqual(max(polls), 5)
+        self.assertEqual(monitor.tracked_scans, 0)
+
+    async def test_incremental_workflow(self):
+        monitor = FetchThrottleMonitor(self.client, 0.1)
+        project = list(self.tenant.projects.values())[0]
+        scan_id = await self.__submit(project)
+
+        tracked = await monitor.wait(project['id'], project['mainBranch'], scan_id, project['name'], 10)
+        self.assertEqual(tracked.reason, "fetched")
+        self.assertTrue(tracked.fetch_start and tracked.fetch_complete)
+        # Each workflow entry is reviewed once even though the workflow was retrieved on several polls.
+        self.assertEqual(tracked.workflow_seen, 2)
+        self.assertGreater(self.__calls("workflow"), 1)
+
+    async def test_imported_scan_found_by_branch(self):
+        monitor = FetchThrottleMonitor(self.client, 0.1)
+        project = list(self.tenant.projects.values())[1]
+        scan_id = await self.__submit(project)
+
+        tracked = await monitor.wait(project['id'], project['mainBranch'], None, project['name'], 10)
+        self.assertEqual(tracked.scan_id, scan_id)
+        self.assertEqual(tracked.reason, "fetched")
+
+    async def test_timeout(self):
+        monitor = FetchThrottleMonitor(self.client, 0.1)
+        project = list(self.tenant.projects.values())[2]
+        scan_id = await self.__submit(project)
+
+        tracked = await monitor.wait(project['id'], project['mainBranch'], scan_id, project['name'], 0.2)
+        self.assertEqual(tracked.reason, "timeout")
+
+
+if __name__ == '__main__':
+    unittest.main()
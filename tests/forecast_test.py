@@ -0,0 +1,52 @@
+import unittest
+from datetime import datetime, timezone
+from utils import ProjectSchedule, PolicyRegistry
+from scan import HostConcurrency
+from logic.forecast import ScheduleForecast
+
+DAILY = "0 0 * * *"
+HOURLY = "0 * * * *"
+START = datetime(2024, 1, 1, 0, 0, tzinfo=timezone.utc)
+
+def schedule(count, crontab, host="scm.local"):
+    return {f"{host}-{crontab}-{x}" : [ProjectSchedule(f"{host}-{crontab}-{x}", crontab, "main", ["sast"], f"https://{host}/org/repo{x}.git")] 
+            for x in range(count)}
+
+
+class TestScheduleForecast(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def setUp(self):
+        self.policies = PolicyRegistry({"daily" : DAILY, "hourly" : HOURLY}, spreads={"daily" : 600})
+
+    def test_hourly_counts(self):
+        forecast = ScheduleForecast(PolicyRegistry({"hourly" : HOURLY}), schedule(5, HOURLY), 0)
+        histogram = forecast.histogram(START, 3)
+        self.assertEqual(len(histogram), 3)
+        self.assertTrue(all([counts[("hourly", "scm.local")] == 5 for counts in histogram.values()]))
+
+    def test_spread_across_minutes(self):
+        histogram = ScheduleForecast(self.policies, schedule(200, DAILY), 0).histogram(START, 1)
+        self.assertEqual(sum([sum(c.values()) for c in histogram.values()]), 200)
+        self.assertTrue(all([minute.minute < 10 for minute in histogram.keys()]))
+        self.assertGreater(len(histogram), 5)
+
+    def test_spread_from_before_start(self):
+        histogram = ScheduleForecast(self.policies, schedule(200, DAILY), 0).histogram(START.replace(minute=5), 1)
+        self.assertTrue(0 < sum([sum(c.values()) for c in histogram.values()]) < 200)
+
+    def test_hot_spots(self):
+        sched = schedule(5, HOURLY) | schedule(3, HOURLY, "bitbucket.local")
+        hosts = HostConcurrency([("bitbucket.local", 2)], 0)
+        rows = list(ScheduleForecast(PolicyRegistry({"hourly" : HOURLY}), sched, 6, hosts).rows(START, 1))
+        self.assertEqual(len(rows), 2)
+        flags = {host : f for _, _, host, _, _, f in rows}
+        self.assertEqual(flags["bitbucket.local"], ["THREADS", "SCM_HOST"])
+        self.assertEqual(flags["scm.local"], ["THREADS"])
+        self.assertTrue(all([total == 8 for _, _, _, _, total, _ in rows]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest, asyncio
+from metrics import MetricsRegistry, endpoint_label, instrument_client, API_LATENCY, API_ERRORS
+from web import HttpServer, HttpResponse
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_counter(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("the_total", "Help.", ("policy",))
+        counter.inc(policy="daily")
+        counter.inc(2, policy="daily")
+        self.assertIn('the_total{policy="daily"} 3', registry.render())
+        self.assertIn("# TYPE the_total counter", registry.render())
+
+    def test_wrong_labels(self):
+        counter = MetricsRegistry().counter("the_total", "Help.", ("policy",))
+        with self.assertRaises(ValueError):
+            counter.inc(outcome="skipped")
+
+    def test_duplicate(self):
+        registry = MetricsRegistry()
+        registry.gauge("the_gauge", "Help.")
+        with self.assertRaises(ValueError):
+            registry.gauge("the_gauge", "Help.")
+
+    def test_gauge_function(self):
+        registry = MetricsRegistry()
+        registry.gauge("the_gauge", "Help.").set_function(lambda: 5)
+        registry.gauge("the_jobs", "Help.", ("policy",)).set_function(lambda: {("hourly",) : 2, ("daily",) : 1})
+        rendered = registry.render()
+        self.assertIn("the_gauge 5", rendered)
+        self.assertIn('the_jobs{policy="hourly"} 2', rendered)
+        self.assertIn('the_jobs{policy="daily"} 1', rendered)
+
+    def test_histogram(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("the_seconds", "Help.", buckets=(1, 5))
+        histogram.observe(0.5)
+        histogram.observe(3)
+        histogram.observe(10)
+        rendered = registry.render()
+        self.assertIn('the_seconds_bucket{le="1"} 1', rendered)
+        self.assertIn('the_seconds_bucket{le="5"} 2', rendered)
+        self.assertIn('the_seconds_bucket{le="+Inf"} 3', rendered)
+        self.assertIn("the_seconds_count 3", rendered)
+        self.assertIn("the_seconds_sum 13.5", rendered)
+
+    def test_label_escape(self):
+        registry = MetricsRegistry()
+        registry.counter("the_total", "Help.", ("endpoint",)).inc(endpoint='a"b')
+        self.assertIn('the_total{endpoint="a\\"b"} 1', registry.render())
+
+
+class TestEndpointLabel(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_ids_removed(self):
+        self.assertEqual(endpoint_label("https://host/api/projects/0a1b2c3d-0000-1111-2222-333344445555?x=1"), "/api/projects/{id}")
+        self.assertEqual(endpoint_label("https://host/api/scans/12/workflow"), "/api/scans/{id}/workflow")
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class _Client:
+    async def get(self, url, **kwargs):
+        return _Response(200 if "ok" in url else 500)
+
+
+class TestInstrumentClient(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    async def test_errors_counted(self):
+        client = _Client()
+        instrument_client(client)
+        self.assertEqual((await client.get("https://host/api/ok")).status_code, 200)
+        await client.get("https://host/api/bad")
+        self.assertIn('endpoint="/api/bad",status="500"} 1', API_ERRORS.render())
+        self.assertIn('cxone_scheduler_api_request_seconds_count{method="GET",endpoint="/api/ok"} 1', API_LATENCY.render())
+
+
+class TestHttpServer(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    async def __request(self, port, request):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response.decode()
+
+    async def test_routes(self):
+        async def handler(query, body, headers):
+            return HttpResponse(200, f"{query.get('x', [''])[0]}:{body.decode()}")
+
+        server = HttpServer("127.0.0.1", 0)
+        server.route("POST", "/echo", handler)
+        await server.start()
+        try:
+            port = server.port
+            response = await self.__request(port, b"POST /echo?x=1 HTTP/1.1\r\nContent-Length: 2\r\n\r\nhi")
+            self.assertTrue(response.startswith("HTTP/1.1 200"))
+            self.assertTrue(response.endswith("1:hi"))
+            self.assertTrue((await self.__request(port, b"GET /echo HTTP/1.1\r\n\r\n")).startswith("HTTP/1.1 405"))
+            self.assertTrue((await self.__request(port, b"GET /nothing HTTP/1.1\r\n\r\n")).startswith("HTTP/1.1 404"))
+            self.assertTrue((await self.__request(port, b"garbage\r\n\r\n")).startswith("HTTP/1.1 400"))
+        finally:
+            await server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from utils import PolicyRegistry, SpreadTrigger, parse_duration_seconds
+from datetime import datetime, timezone
+
+class TestPolicyRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = PolicyRegistry({"daily" : "0 0 * * *", "hourly" : "0 * * * *", "audit-policy" : "0 0 * * *"})
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_valid_policy(self):
+        ss = self.registry.parse("daily")
+        self.assertTrue(ss.is_valid() and ss.get_crontab_schedule() == "0 0 * * *")
+
+    def test_policy_is_case_insensitive_and_unquoted(self):
+        ss = self.registry.parse("'Hourly'")
+        self.assertTrue(ss.is_valid() and ss.get_crontab_schedule() == "0 * * * *")
+
+    def test_invalid_policy(self):
+        self.assertFalse(self.registry.parse("weekly").is_valid())
+
+    def test_partial_name_is_invalid(self):
+        self.assertFalse(self.registry.parse("audit").is_valid())
+
+    def test_parse_is_memoized(self):
+        self.assertIs(self.registry.parse("daily"), self.registry.parse("daily"))
+
+    def test_trigger_shared_by_crontab(self):
+        self.assertIs(self.registry.trigger(self.registry["daily"]), self.registry.trigger(self.registry["audit-policy"]))
+
+    def test_crontabs_are_distinct(self):
+        self.assertEqual(len(self.registry.crontabs), 2)
+
+    def test_mapping(self):
+        self.assertTrue("daily" in self.registry.keys() and len(self.registry) == 3)
+
+
+class TestPolicySpread(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = PolicyRegistry({"daily" : "0 0 * * *", "hourly" : "0 * * * *"}, {"daily" : 7200})
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_parse_duration(self):
+        self.assertTrue(parse_duration_seconds("2h") == 7200 and parse_duration_seconds("30m") == 1800 
+                        and parse_duration_seconds("45") == 45 and parse_duration_seconds("2 hours") is None)
+
+    def test_offset_is_stable(self):
+        self.assertEqual(self.registry.offset("0 0 * * *", "project-a"), 
+                         PolicyRegistry({"daily" : "0 0 * * *"}, {"daily" : 7200}).offset("0 0 * * *", "project-a"))
+
+    def test_offset_within_window(self):
+        self.assertTrue(all(0 <= self.registry.offset("0 0 * * *", f"project-{x}") < 7200 for x in range(100)))
+
+    def test_offsets_are_spread(self):
+        self.assertGreater(len(set(self.registry.offset("0 0 * * *", f"project-{x}") for x in range(100))), 90)
+
+    def test_no_spread_uses_shared_trigger(self):
+        self.assertIs(self.registry.trigger("0 * * * *", "project-a"), self.registry.trigger("0 * * * *"))
+
+    def test_spread_trigger_fire_time(self):
+        trigger = self.registry.trigger("0 0 * * *", "project-a")
+        offset = self.registry.offset("0 0 * * *", "project-a")
+        now = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+        fire = trigger.get_next_fire_time(None, now)
+        self.assertTrue(isinstance(trigger, SpreadTrigger) 
+                        and fire == datetime(2024, 1, 2, tzinfo=timezone.utc) + trigger.offset
+                        and trigger.offset.total_seconds() == offset)
+
+    def test_spread_trigger_next_after_previous(self):
+        trigger = self.registry.trigger("0 0 * * *", "project-a")
+        now = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+        first = trigger.get_next_fire_time(None, now)
+        self.assertEqual(trigger.get_next_fire_time(first, first), first.replace(day=3))
+
+    def test_shared_crontab_warns(self):
+        policies = {"daily" : "0 0 * * *", "audit-policy" : "0 0 * * *", "audit_policy" : "0 0 * * *", "hourly" : "0 * * * *"}
+        with self.assertLogs("utils", "WARNING") as logs:
+            registry = PolicyRegistry(policies, {"daily" : 600, "audit-policy" : 1200, "audit_policy" : 1200}, {"hourly" : 2.0})
+        self.assertEqual(registry.spread("0 0 * * *"), 1200)
+        self.assertEqual(registry.weight("0 * * * *"), 2.0)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("['audit_policy', 'daily']", logs.output[0])
+
+    def test_distinct_crontab_does_not_warn(self):
+        with self.assertNoLogs("utils", "WARNING"):
+            PolicyRegistry({"daily" : "0 0 * * *", "hourly" : "0 * * * *"}, {"daily" : 600}, {"daily" : 2.0})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest, asyncio
+from unittest import mock
+from scan.prefire import PreFireChecks
+from cxone_api import CxOneClient, CxOneAuthEndpoint, CxOneApiEndpoint
+from benchmarks.tenant import SyntheticTenant
+from benchmarks.mockapi import MockCxOneApi
+
+
+class _PreFireTest(unittest.IsolatedAsyncioTestCase):
+    QUEUE_SECONDS = 0
+
+    def setUp(self):
+        self.tenant = SyntheticTenant(10, seed=5)
+        self.api = MockCxOneApi(self.tenant, queue_seconds=self.QUEUE_SECONDS, fetch_seconds=0)
+        self.client = CxOneClient.create_with_oauth("test", "test", "test", CxOneAuthEndpoint("test", "test.invalid"),
+                                                    CxOneApiEndpoint("test.invalid"))
+        self.api.attach(self.client)
+        self.projects = list(self.tenant.projects.values())
+        self.collect = mock.patch.object(PreFireChecks, "_PreFireChecks__COLLECT_S", 0.05)
+        self.collect.start()
+
+    def tearDown(self):
+        self.collect.stop()
+
+    async def submit(self, project, branch, tags = None):
+        body = {"project" : {"id" : project['id']}, "handler" : {"branch" : branch}}
+        if tags is not None:
+            body['tags'] = tags
+        await self.client.post("https://test.invalid/api/scans", json=body)
+
+    def scan_queries(self) -> int:
+        return self.api.calls.get("GET scans", 0)
+
+    async def statuses(self, checks, trigger_key, projects) -> list:
+        return await asyncio.gather(*[checks.status(trigger_key, p['id']) for p in projects])
+
+
+class TestRunningScans(_PreFireTest):
+    QUEUE_SECONDS = 60
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    async def test_scheduled_and_imported(self):
+        scheduled, manual, idle = self.projects[:3]
+        await self.submit(scheduled, "main", {"scheduled" : "hourly"})
+        await self.submit(manual, "main")
+
+        scheduled_status, manual_status, idle_status = await self.statuses(PreFireChecks(self.client), "hourly", [scheduled, manual, idle])
+
+        self.assertTrue(scheduled_status.fresh)
+        self.assertTrue(scheduled_status.running("main", False))
+        self.assertFalse(scheduled_status.running("develop", False))
+        # Scans of projects imported from an SCM are not tagged, so any running scan counts.
+        self.assertFalse(manual_status.running("main", False))
+        self.assertTrue(manual_status.running("main", True))
+        self.assertFalse(idle_status.running("main", True))
+
+    async def test_one_batch_per_trigger(self):
+        checks = PreFireChecks(self.client)
+        await self.statuses(checks, "daily", self.projects[:1])
+        single = self.scan_queries()
+        self.assertGreater(single, 0)
+
+        await self.statuses(checks, "daily", self.projects)
+        self.assertEqual(self.scan_queries(), single * 2)
+
+        await asyncio.gather(self.statuses(checks, "daily", self.projects[:5]), self.statuses(checks, "hourly", self.projects[5:]))
+        self.assertEqual(self.scan_queries(), single * 4)
+
+
+class TestRecentlyCompleted(_PreFireTest):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    async def test_recently_completed(self):
+        completed, other = self.projects[:2]
+        await self.submit(completed, "main")
+
+        with mock.patch.dict("os.environ", {"RECENT_SCAN_HOURS" : "12"}):
+            completed_status, other_status = await self.statuses(PreFireChecks(self.client), "daily", [completed, other])
+
+        self.assertTrue(completed_status.recently_completed("main"))
+        self.assertFalse(completed_status.recently_completed("develop"))
+        self.assertFalse(completed_status.running("main", True))
+        self.assertFalse(other_status.recently_completed("main"))
+
+    async def test_recent_check_disabled(self):
+        project = self.projects[0]
+        await self.submit(project, "main")
+
+        with mock.patch.dict("os.environ", {"RECENT_SCAN_HOURS" : "0"}):
+            status, = await self.statuses(PreFireChecks(self.client), "daily", [project])
+
+        self.assertFalse(status.recently_completed("main"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest, asyncio, os, tempfile, time
+from datetime import datetime
+from metrics import REGISTRY
+from metrics.profiling import SamplingProfiler, LoopLagMonitor, phase
+
+
+class TestSamplingProfiler(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_session_written_when_last_user_exits(self):
+        with tempfile.TemporaryDirectory() as path:
+            profiler = SamplingProfiler(path, 0.001)
+            profiler.start()
+            try:
+                with profiler.session("fire-daily"):
+                    with profiler.session("fire-daily"):
+                        time.sleep(0.05)
+                    self.assertEqual(os.listdir(path), [])
+                    time.sleep(0.05)
+            finally:
+                profiler.stop()
+
+            files = os.listdir(path)
+            self.assertEqual(len(files), 1)
+            self.assertTrue(files[0].startswith("fire-daily-") and files[0].endswith(".folded"))
+            with open(os.path.join(path, files[0]), "rt") as f:
+                lines = f.read().splitlines()
+            self.assertTrue(len(lines) > 0)
+            self.assertTrue(any(line.startswith("MainThread;") and "test_session_written_when_last_user_exits" in line for line in lines))
+            self.assertTrue(all(int(line.rsplit(" ", 1)[1]) > 0 for line in lines))
+
+    def __profile(self, path, body):
+        profiler = SamplingProfiler(path, 0.001)
+        profiler.start()
+        try:
+            body(profiler)
+        finally:
+            profiler.stop()
+        return sorted(os.listdir(path))
+
+    def __samples(self, path, file_name):
+        with open(os.path.join(path, file_name), "rt") as f:
+            return sum([int(line.rsplit(" ", 1)[1]) for line in f.read().splitlines()])
+
+    def test_fires_written_separately(self):
+        first, second = datetime(2026, 1, 1, 0, 0), datetime(2026, 1, 1, 1, 0)
+
+        def body(profiler):
+            with profiler.session("fire-daily", first):
+                with profiler.session("fire-daily", second):
+                    time.sleep(0.02)
+                # The later fire is written while the earlier one is still open.
+                self.assertEqual(os.listdir(path), ["fire-daily-20260101T010000.folded"])
+
+        with tempfile.TemporaryDirectory() as path:
+            self.assertEqual(self.__profile(path, body), ["fire-daily-20260101T000000.folded", "fire-daily-20260101T010000.folded"])
+
+    def test_later_scans_of_a_fire_added_to_its_file(self):
+        fired = datetime(2026, 1, 1, 0, 0)
+
+        def body(profiler):
+            with profiler.session("fire-daily", fired):
+                time.sleep(0.05)
+            with profiler.session("fire-daily", fired):
+                time.sleep(0.05)
+
+        with tempfile.TemporaryDirectory() as path:
+            files = self.__profile(path, body)
+            self.assertEqual(files, ["fire-daily-20260101T000000.folded"])
+            self.assertGreater(self.__samples(path, files[0]), 50)
+
+    def test_waiting_not_sampled(self):
+        def body(profiler):
+            with profiler.session("fire-daily", datetime(2026, 1, 1, 0, 0)):
+                time.sleep(0.2)
+            with profiler.session("fire-daily", datetime(2026, 1, 1, 1, 0)):
+                time.sleep(0.02)
+                with profiler.waiting():
+                    time.sleep(0.2)
+
+        with tempfile.TemporaryDirectory() as path:
+            working, waiting = self.__profile(path, body)
+            self.assertLess(self.__samples(path, waiting) * 3, self.__samples(path, working))
+
+    def test_phase(self):
+        with phase("test_phase"):
+            pass
+        self.assertIn('cxone_scheduler_phase_seconds_count{phase="test_phase"} 1', REGISTRY.render())
+
+
+class TestLoopLagMonitor(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    async def test_blocked_loop_logged(self):
+        monitor = LoopLagMonitor(0.05, 0.01)
+        monitor.start()
+        try:
+            with self.assertLogs("LoopLagMonitor", "WARNING") as logs:
+                time.sleep(0.3)
+                await asyncio.sleep(0.05)
+        finally:
+            monitor.stop()
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("test_blocked_loop_logged", logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
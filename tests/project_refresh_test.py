@@ -0,0 +1,51 @@
+import unittest, json
+from web.refresh import ProjectRefreshHandler
+from logic.diff import ScheduleDiff
+
+
+class FakeScheduler:
+
+    def __init__(self):
+        self.refreshed = []
+
+    async def refresh_projects(self, project_ids):
+        self.refreshed.append(project_ids)
+        return ScheduleDiff({}, {})
+
+
+class TestProjectRefreshHandler(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    async def test_not_started(self):
+        handler = ProjectRefreshHandler()
+        self.assertEqual((await handler({"project" : ["a"]}, b"", {})).status, 503)
+
+    async def test_body_and_query(self):
+        handler = ProjectRefreshHandler()
+        handler.scheduler = FakeScheduler()
+        response = await handler({"project" : ["a"]}, json.dumps({"projects" : ["b", "a"]}).encode(), {})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(handler.scheduler.refreshed, [["a", "b"]])
+        self.assertEqual(json.loads(response.body)["projects"], 2)
+
+    async def test_bad_requests(self):
+        handler = ProjectRefreshHandler(max_projects=2)
+        handler.scheduler = FakeScheduler()
+        self.assertEqual((await handler({}, b"", {})).status, 400)
+        self.assertEqual((await handler({}, b'{"projects" : "a"}', {})).status, 400)
+        self.assertEqual((await handler({}, b"not json", {})).status, 400)
+        self.assertEqual((await handler({"project" : ["a", "b", "c"]}, b"", {})).status, 413)
+        self.assertEqual(handler.scheduler.refreshed, [])
+
+    async def test_token(self):
+        handler = ProjectRefreshHandler("secret")
+        handler.scheduler = FakeScheduler()
+        self.assertEqual((await handler({"project" : ["a"]}, b"", {})).status, 401)
+        self.assertEqual((await handler({"project" : ["a"]}, b"", {"authorization" : "Bearer wrong"})).status, 401)
+        self.assertEqual((await handler({"project" : ["a"]}, b"", {"authorization" : "Bearer secret"})).status, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
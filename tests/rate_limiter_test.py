@@ -0,0 +1,56 @@
+import unittest
+from time import monotonic
+from scan.ratelimit import SubmissionRateLimiter
+
+class TestSubmissionRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    async def test_burst_is_immediate(self):
+        limiter = SubmissionRateLimiter(60, 5)
+        start = monotonic()
+        for _ in range(5):
+            await limiter.acquire()
+        self.assertLess(monotonic() - start, 0.1)
+
+    async def test_rate_after_burst(self):
+        limiter = SubmissionRateLimiter(600, 1)
+        await limiter.acquire()
+        start = monotonic()
+        await limiter.acquire()
+        self.assertGreater(monotonic() - start, 0.05)
+
+    def test_throttled_on_429(self):
+        limiter = SubmissionRateLimiter(60, 1)
+        limiter.feedback(429)
+        self.assertEqual(limiter.scans_per_minute, 30)
+
+    def test_throttled_on_5xx(self):
+        limiter = SubmissionRateLimiter(60, 1)
+        limiter.feedback(503)
+        limiter.feedback(500)
+        self.assertEqual(limiter.scans_per_minute, 15)
+
+    def test_client_errors_do_not_throttle(self):
+        limiter = SubmissionRateLimiter(60, 1)
+        limiter.feedback(400)
+        self.assertEqual(limiter.scans_per_minute, 60)
+
+    def test_throttle_floor(self):
+        limiter = SubmissionRateLimiter(60, 1)
+        for _ in range(20):
+            limiter.throttled()
+        self.assertGreater(limiter.scans_per_minute, 0)
+
+    def test_recovers_gradually(self):
+        limiter = SubmissionRateLimiter(60, 1)
+        limiter.throttled()
+        limiter.feedback(201)
+        self.assertTrue(30 < limiter.scans_per_minute < 60)
+        for _ in range(20):
+            limiter.feedback(201)
+        self.assertEqual(limiter.scans_per_minute, 60)
+
+if __name__ == '__main__':
+    unittest.main()
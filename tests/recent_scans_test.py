@@ -0,0 +1,67 @@
+import unittest
+from unittest import mock
+from scan.recent import RecentScanIndex
+from utils import get_recent_scan_refresh_seconds_config
+
+SCANS = [{"projectId" : "a", "branch" : "main"}, {"projectId" : "a", "branch" : "dev"}, {"projectId" : "b", "branch" : "main"}]
+
+
+class TestRecentScanIndex(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def setUp(self):
+        self.queries = []
+
+        def pages(coro, element, **kwargs):
+            self.queries.append(kwargs)
+            async def gen():
+                for scan in SCANS:
+                    yield scan
+            return gen()
+
+        self.patcher = mock.patch("scan.recent.page_generator", side_effect=pages)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    async def test_one_query_for_all_projects(self):
+        index = RecentScanIndex(None, 12, 720)
+        self.assertTrue(await index.completed("a", "main"))
+        self.assertTrue(await index.completed("a", "dev"))
+        self.assertFalse(await index.completed("b", "dev"))
+        self.assertFalse(await index.completed("c", "main"))
+        self.assertEqual(await index.branches("a"), {"main", "dev"})
+        self.assertEqual(len(self.queries), 1)
+        self.assertEqual(self.queries[0]['statuses'], ['Completed'])
+        self.assertNotIn("project_ids", self.queries[0].keys())
+
+    async def test_reloads_when_stale(self):
+        index = RecentScanIndex(None, 12, 720)
+        with mock.patch("scan.recent.monotonic", return_value=1000):
+            await index.completed("a", "main")
+        with mock.patch("scan.recent.monotonic", return_value=1719):
+            await index.completed("a", "main")
+        self.assertEqual(len(self.queries), 1)
+        with mock.patch("scan.recent.monotonic", return_value=1720):
+            await index.completed("a", "main")
+        self.assertEqual(len(self.queries), 2)
+
+    def test_refresh_tied_to_recent_hours(self):
+        with mock.patch.dict("os.environ", {"RECENT_SCAN_HOURS" : "12"}):
+            self.assertEqual(get_recent_scan_refresh_seconds_config(), 720)
+        with mock.patch.dict("os.environ", {"RECENT_SCAN_HOURS" : "12", "RECENT_SCAN_REFRESH_SECONDS" : "90"}):
+            self.assertEqual(get_recent_scan_refresh_seconds_config(), 90)
+
+    async def test_failure_falls_back(self):
+        self.patcher.stop()
+        with mock.patch("scan.recent.page_generator", side_effect=Exception("failed")):
+            index = RecentScanIndex(None, 12, 720)
+            self.assertIsNone(await index.completed("a", "main"))
+        self.patcher.start()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from unittest import mock
+from scan.repocache import RepoConfigCache
+
+
+class TestRepoConfigCache(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_get_put(self):
+        cache = RepoConfigCache(60, 10)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", "config-a")
+        self.assertEqual(cache.get("a"), "config-a")
+
+    def test_expires(self):
+        cache = RepoConfigCache(60, 10)
+        with mock.patch("scan.repocache.monotonic", return_value=1000):
+            cache.put("a", "config-a")
+        with mock.patch("scan.repocache.monotonic", return_value=1059):
+            self.assertEqual(cache.get("a"), "config-a")
+        with mock.patch("scan.repocache.monotonic", return_value=1060):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_size_bound_drops_least_recent(self):
+        cache = RepoConfigCache(60, 2)
+        cache.put("a", "config-a")
+        cache.put("b", "config-b")
+        cache.get("a")
+        cache.put("c", "config-c")
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "config-a")
+
+    def test_invalidate(self):
+        cache = RepoConfigCache(60, 10)
+        cache.put("a", "config-a")
+        cache.invalidate("a")
+        cache.invalidate("missing")
+        self.assertIsNone(cache.get("a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from utils import ProjectSchedule
+from logic.diff import ScheduleDiff
+
+DAILY = "0 0 * * *"
+HOURLY = "0 * * * *"
+
+def sched(pid, schedule=DAILY, branch="main", engines=None, repo="https://scm/org/repo.git"):
+    return ProjectSchedule(pid, schedule, branch, engines if engines is not None else ["sast"], repo)
+
+class TestProjectSchedule(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_equal_values_are_equal(self):
+        self.assertTrue(sched("a") == sched("a") and hash(sched("a")) == hash(sched("a")))
+
+    def test_engine_lists_compare_by_value(self):
+        self.assertEqual(sched("a", engines=["sast", "sca"]), sched("a", engines=["sast", "sca"]))
+
+    def test_branch_differs(self):
+        self.assertNotEqual(sched("a"), sched("a", branch="dev"))
+
+    def test_round_trip(self):
+        self.assertEqual(ProjectSchedule.from_dict(sched("a").to_dict()), sched("a"))
+
+
+class TestScheduleDiff(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_unchanged(self):
+        diff = ScheduleDiff({"a" : [sched("a")]}, {"a" : [sched("a")]})
+        self.assertTrue(diff.empty)
+
+    def test_order_does_not_matter(self):
+        diff = ScheduleDiff({"a" : [sched("a"), sched("a", HOURLY)]}, {"a" : [sched("a", HOURLY), sched("a")]})
+        self.assertTrue(diff.empty)
+
+    def test_new_and_removed(self):
+        diff = ScheduleDiff({"a" : [sched("a")]}, {"b" : [sched("b")]})
+        self.assertTrue(list(diff.new.keys()) == ["b"] and list(diff.removed.keys()) == ["a"] and len(diff.changed) == 0)
+
+    def test_payload_only_change(self):
+        diff = ScheduleDiff({"a" : [sched("a")]}, {"a" : [sched("a", branch="dev")]})
+        self.assertTrue(len(diff.payload_changed) == 1 and len(diff.trigger_changed) == 0)
+        self.assertEqual(diff.changed["a"].modified, [(sched("a"), sched("a", branch="dev"))])
+
+    def test_trigger_change(self):
+        diff = ScheduleDiff({"a" : [sched("a")]}, {"a" : [sched("a", HOURLY)]})
+        change = diff.changed["a"]
+        self.assertTrue(change.trigger_changed and change.removed == [sched("a")] and change.added == [sched("a", HOURLY)])
+
+    def test_added_schedule(self):
+        diff = ScheduleDiff({"a" : [sched("a")]}, {"a" : [sched("a"), sched("a", HOURLY)]})
+        change = diff.changed["a"]
+        self.assertTrue(change.removed == [] and change.added == [sched("a", HOURLY)] and change.modified == [])
+
+    def test_duplicate_schedule_removed(self):
+        diff = ScheduleDiff({"a" : [sched("a"), sched("a")]}, {"a" : [sched("a")]})
+        self.assertEqual(diff.changed["a"].removed, [sched("a")])
+
+if __name__ == '__main__':
+    unittest.main()
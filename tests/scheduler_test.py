@@ -0,0 +1,264 @@
+import unittest, asyncio, os, tempfile
+from unittest import mock
+from logic import Scheduler
+from logic.snapshot import ScheduleSnapshot
+from utils import GroupSchedules, ProjectSchedule, load_policies
+from cxone_api import CxOneClient, CxOneAuthEndpoint, CxOneApiEndpoint
+from benchmarks.tenant import SyntheticTenant
+from benchmarks.mockapi import MockCxOneApi
+
+
+class _SchedulerTest(unittest.IsolatedAsyncioTestCase):
+    # Runs the scheduler against the mock Checkmarx One API with a clean configuration.
+    ENV = {}
+    LATENCY_MS = 0
+    GROUPED = 0
+
+    def setUp(self):
+        self.env = mock.patch.dict(os.environ, {k : v for k, v in os.environ.items() if k in ["PATH", "HOME"]} | self.ENV, clear=True)
+        self.env.start()
+        self.tenant = SyntheticTenant(60, seed=7, tagged=0.6, grouped=self.GROUPED, group_count=3)
+        self.api = MockCxOneApi(self.tenant, latency_ms=self.LATENCY_MS, fetch_seconds=0, queue_seconds=0)
+        self.client = CxOneClient.create_with_oauth("test", "test", "test", CxOneAuthEndpoint("test", "test.invalid"),
+                                                    CxOneApiEndpoint("test.invalid"))
+        self.api.attach(self.client)
+        self.policies = load_policies()
+
+    def tearDown(self):
+        self.env.stop()
+
+    async def start(self, default_schedule = None, group_schedules = None, initialized_cb = None) -> Scheduler:
+        return await Scheduler.start(self.client, default_schedule, group_schedules if group_schedules is not None else GroupSchedules(),
+                                     self.policies, initialized_cb)
+
+    @staticmethod
+    def schedule_of(scheduler : Scheduler) -> dict:
+        return {pid : sorted([str(s) for s in scheds]) for pid, scheds in scheduler._Scheduler__the_schedule.items()}
+
+    def tagged(self) -> list:
+        return [pid for pid, p in self.tenant.projects.items() if "schedule" in p['tags'].keys()]
+
+
+class TestTargetedRefresh(_SchedulerTest):
+    ENV = {"CRAWL_PAGE_SIZE" : "5"}
+    LATENCY_MS = 20
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    async def test_not_queued_behind_full_refresh(self):
+        scheduler = await self.start()
+        pid = self.tagged()[0]
+
+        full = asyncio.create_task(scheduler.refresh_schedule())
+        await asyncio.sleep(0.05)
+
+        self.tenant.projects[pid]['tags'] = {"schedule" : "hourly:refreshed"}
+        diff = await scheduler.refresh_projects([pid])
+        self.assertFalse(full.done())
+        self.assertEqual(list(diff.changed.keys()), [pid])
+
+        await full
+        self.assertTrue(all(["refreshed" in s for s in self.schedule_of(scheduler)[pid]]))
+
+        after = await scheduler.refresh_schedule()
+        self.assertEqual((len(after.new), len(after.removed), len(after.changed)), (0, 0, 0))
+
+    async def test_removed_project(self):
+        scheduler = await self.start()
+        pid = self.tagged()[1]
+        del self.tenant.projects[pid]
+
+        diff = await scheduler.refresh_projects([pid])
+        self.assertEqual(list(diff.removed.keys()), [pid])
+        self.assertNotIn(pid, scheduler.scheduled_projects)
+
+
+class TestIncrementalRefresh(_SchedulerTest):
+    ENV = {"INCREMENTAL_REFRESH" : "true"}
+    GROUPED = 0.5
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def __count_resolutions(self, scheduler):
+        resolved = []
+        resolve = scheduler._Scheduler__resolve_project_uncached
+
+        async def counted(project, bad_cb, group_crontabs):
+            resolved.append(project['id'])
+            return await resolve(project, bad_cb, group_crontabs)
+
+        scheduler._Scheduler__resolve_project_uncached = counted
+        return resolved
+
+    async def test_reuse_and_group_schedule_change(self):
+        group_schedules = GroupSchedules()
+        scheduler = await self.start("daily", group_schedules)
+        resolved = self.__count_resolutions(scheduler)
+
+        diff = await scheduler.refresh_schedule()
+        self.assertEqual(resolved, [])
+        self.assertEqual((len(diff.new), len(diff.removed), len(diff.changed)), (0, 0, 0))
+
+        # A new group schedule changes the resolution of unchanged projects in the group.
+        group = self.tenant.groups[0]
+        members = [pid for pid, p in self.tenant.projects.items() if group['id'] in p['groups'] and "schedule" not in p['tags'].keys()]
+        self.assertGreater(len(members), 0)
+        group_schedules.add_schedule(group['path'], self.policies.parse("hourly"))
+
+        diff = await scheduler.refresh_schedule()
+        self.assertEqual(len(resolved), len(self.tenant.projects))
+        self.assertEqual(set(diff.changed.keys()), set(members))
+        hourly = self.policies.parse("hourly").get_crontab_schedule()
+        for pid in members:
+            self.assertEqual([s.schedule for s in scheduler._Scheduler__the_schedule[pid]], [hourly])
+
+        resolved.clear()
+        await scheduler.refresh_schedule()
+        self.assertEqual(resolved, [])
+
+
+class TestProgressiveStartup(_SchedulerTest):
+    ENV = {"CRAWL_PAGE_SIZE" : "5"}
+    LATENCY_MS = 20
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    async def test_jobs_registered_during_crawl(self):
+        started = []
+        startup = asyncio.create_task(self.start("daily", initialized_cb=started.append))
+
+        while len(started) == 0 or started[0].scheduled_scans == 0:
+            await asyncio.sleep(0.01)
+        scheduler = started[0]
+
+        progress = scheduler.startup_progress
+        self.assertFalse(startup.done())
+        self.assertFalse(progress['ready'])
+        self.assertLess(progress['projects_crawled'], len(self.tenant.projects))
+        jobs = scheduler._Scheduler__job_cache
+        self.assertEqual(set(jobs.keys()), set(scheduler.scheduled_projects))
+        self.assertEqual(sum([len(j) for j in jobs.values()]), sum([len(s) for s in scheduler._Scheduler__the_schedule.values()]))
+
+        await startup
+        self.assertTrue(scheduler.ready)
+        self.assertEqual(scheduler.startup_progress['projects_crawled'], len(self.tenant.projects))
+        self.assertEqual(set(scheduler._Scheduler__job_cache.keys()), set(self.tenant.projects.keys()))
+
+
+class TestConcurrentCrawl(_SchedulerTest):
+    ENV = {"CRAWL_PAGE_SIZE" : "10"}
+    LATENCY_MS = 5
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    async def __audit(self, concurrency):
+        bad = []
+        with mock.patch.dict(os.environ, {"CRAWL_CONCURRENCY" : str(concurrency)}):
+            schedule = await Scheduler.audit(self.client, "daily", GroupSchedules(), self.policies, lambda pid, reason: bad.append((pid, reason)))
+        return {pid : sorted([str(s) for s in scheds]) for pid, scheds in schedule.items()}, sorted(bad)
+
+    async def test_same_schedule_as_sequential(self):
+        tagged = self.tagged()
+        self.tenant.projects[tagged[0]]['tags']['schedule'] = ""
+        self.tenant.projects[tagged[1]]['tags']['schedule'] = "not-a-policy"
+
+        sequential, sequential_bad = await self.__audit(1)
+        self.assertEqual(sorted(sequential_bad), sorted([(tagged[0], "No schedule tag value."), (tagged[1], "Bad schedule tag value.")]))
+        self.assertGreater(len(sequential), 0)
+
+        concurrent, concurrent_bad = await self.__audit(8)
+        self.assertEqual(concurrent, sequential)
+        self.assertEqual(concurrent_bad, sequential_bad)
+
+
+class TestAdaptiveStartup(_SchedulerTest):
+    ENV = {"ADAPTIVE_THREADS" : "true", "ADAPTIVE_MAX_QUEUED" : "10"}
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    async def test_queue_poll_only_when_started(self):
+        captured = []
+        initialize = Scheduler._Scheduler__initialize
+
+        async def capture(*args, **kwargs):
+            captured.append(await initialize(*args, **kwargs))
+            return captured[-1]
+
+        with mock.patch.object(Scheduler, "_Scheduler__initialize", capture):
+            await Scheduler.audit(self.client, "daily", GroupSchedules(), self.policies, None)
+            self.assertIsNone(captured[0]._Scheduler__adaptive._AdaptiveConcurrency__queue_task)
+
+            scheduler = await self.start("daily")
+        task = scheduler._Scheduler__adaptive._AdaptiveConcurrency__queue_task
+        self.assertIsNotNone(task)
+        task.cancel()
+
+
+class TestSnapshot(_SchedulerTest):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "schedule.json")
+        self.ENV = {"SNAPSHOT_PATH" : self.path}
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        self.dir.cleanup()
+
+    async def test_round_trip(self):
+        schedule = {"p1" : [ProjectSchedule("p1", "0 1 * * *", "main", ["sast", "sca"], "https://github.com/p1.git")],
+                    "p2" : [ProjectSchedule("p2", "0 * * * *", "develop", None, None), ProjectSchedule("p2", "0 1 * * *", "main", [], None)]}
+        await ScheduleSnapshot.save(self.path, schedule)
+        self.assertFalse(os.path.exists(f"{self.path}.tmp"))
+
+        loaded = await ScheduleSnapshot.load(self.path)
+        self.assertEqual({pid : [repr(s) for s in scheds] for pid, scheds in loaded.items()},
+                         {pid : [repr(s) for s in scheds] for pid, scheds in schedule.items()})
+
+    async def test_missing_or_corrupt(self):
+        self.assertIsNone(await ScheduleSnapshot.load(self.path))
+        with open(self.path, "wt") as f:
+            f.write("{")
+        self.assertIsNone(await ScheduleSnapshot.load(self.path))
+
+    async def test_warm_start(self):
+        cold = await self.start("daily")
+        self.assertEqual(cold.startup_progress['source'], "crawl")
+        self.assertTrue(os.path.exists(self.path))
+
+        crawl_calls = dict(self.api.calls)
+        warm = await self.start("daily")
+        self.assertTrue(warm.ready)
+        self.assertEqual(warm.startup_progress['source'], "snapshot")
+        self.assertEqual(self.schedule_of(warm), self.schedule_of(cold))
+        # The schedule is reconciled with the tenant after startup.
+        self.assertEqual(self.api.calls, crawl_calls)
+
+        await warm._Scheduler__reconcile_task
+        self.assertGreater(sum(self.api.calls.values()), sum(crawl_calls.values()))
+        self.assertEqual(self.schedule_of(warm), self.schedule_of(cold))
+
+    async def test_unknown_policy_dropped_on_load(self):
+        hourly = self.policies.parse("hourly").get_crontab_schedule()
+        pid = self.tagged()[0]
+        await ScheduleSnapshot.save(self.path, {
+            pid : [ProjectSchedule(pid, hourly, "main", None, None), ProjectSchedule(pid, "1 2 3 4 5", "develop", None, None)],
+            "removed" : [ProjectSchedule("removed", "1 2 3 4 5", "main", None, None)]})
+
+        scheduler = await Scheduler._Scheduler__initialize(self.client, None, GroupSchedules(), self.policies)
+        loaded = await scheduler._Scheduler__load_snapshot()
+        self.assertEqual(list(loaded.keys()), [pid])
+        self.assertEqual([(s.schedule, s.branch) for s in loaded[pid]], [(hourly, "main")])
+
+
+if __name__ == '__main__':
+    unittest.main()
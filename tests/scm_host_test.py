@@ -0,0 +1,68 @@
+import unittest, asyncio
+from utils import get_repo_host
+from scan.hosts import HostConcurrency
+
+class TestRepoHost(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_https(self):
+        self.assertEqual(get_repo_host("https://github.com/the_org/the_repo.git"), "github.com")
+
+    def test_http_with_port_and_creds(self):
+        self.assertEqual(get_repo_host("http://someone@The_Host:7990/scm/the_org/the_repo.git"), "the_host")
+
+    def test_ssh_url(self):
+        self.assertEqual(get_repo_host("ssh://the_user@the_host:7999/the_org/the_repo.git"), "the_host")
+
+    def test_scp_like(self):
+        self.assertEqual(get_repo_host("git@github.com:the_org/the_repo.git"), "github.com")
+
+    def test_none(self):
+        self.assertIsNone(get_repo_host(None))
+
+
+class TestHostConcurrency(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_first_pattern_wins(self):
+        hosts = HostConcurrency([("bitbucket.corp.local", 2), ("*.corp.local", 5)], 0)
+        self.assertTrue(hosts.limit_for("bitbucket.corp.local") == 2 and hosts.limit_for("gitlab.corp.local") == 5)
+
+    def test_default(self):
+        self.assertEqual(HostConcurrency([("*.corp.local", 5)], 3).limit_for("github.com"), 3)
+
+    async def test_slow_host_does_not_block_others(self):
+        hosts = HostConcurrency([("slow.corp.local", 1)], 0)
+        order = []
+
+        async def scan(url, delay):
+            async with hosts.slot(url):
+                await asyncio.sleep(delay)
+                order.append(url)
+
+        await asyncio.gather(scan("https://slow.corp.local/a.git", 0.05), scan("https://slow.corp.local/b.git", 0.05), 
+                             scan("https://github.com/c.git", 0.01))
+        self.assertEqual(order, ["https://github.com/c.git", "https://slow.corp.local/a.git", "https://slow.corp.local/b.git"])
+
+    async def test_priority_order(self):
+        hosts = HostConcurrency([("slow.corp.local", 1)], 0)
+        order = []
+
+        async def scan(url, priority):
+            async with hosts.slot(url, priority):
+                await asyncio.sleep(0.01)
+                order.append(url)
+
+        first = asyncio.create_task(scan("https://slow.corp.local/a.git", (1, 0.0)))
+        await asyncio.sleep(0)
+        await asyncio.gather(first, scan("https://slow.corp.local/b.git", (1, -10.0)), scan("https://slow.corp.local/c.git", (0, -5.0)),
+                             scan("https://slow.corp.local/d.git", None))
+        self.assertEqual(order, ["https://slow.corp.local/a.git", "https://slow.corp.local/c.git", "https://slow.corp.local/b.git",
+                                 "https://slow.corp.local/d.git"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest, os
+from unittest import mock
+from utils import ShardAssignment, get_shard_index_config, get_shard_config_error, load_shard_assignment
+
+PROJECTS = [f"project-{x}" for x in range(3000)]
+
+class TestShardAssignment(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_single_shard_owns_all(self):
+        shard = ShardAssignment(0, 1)
+        self.assertTrue(all([shard.owns(p) for p in PROJECTS]))
+
+    def test_each_project_has_one_owner(self):
+        shards = [ShardAssignment(x, 3) for x in range(3)]
+        for p in PROJECTS:
+            self.assertEqual(len([s for s in shards if s.owns(p)]), 1)
+
+    def test_balanced(self):
+        shard = ShardAssignment(0, 3)
+        counts = [0, 0, 0]
+        for p in PROJECTS:
+            counts[shard.owner(p)] += 1
+        for count in counts:
+            self.assertTrue(800 < count < 1200)
+
+    def test_adding_shard_moves_only_to_new_shard(self):
+        before = ShardAssignment(0, 3)
+        after = ShardAssignment(0, 4)
+        moved = [p for p in PROJECTS if before.owner(p) != after.owner(p)]
+        self.assertTrue(all([after.owner(p) == 3 for p in moved]))
+        self.assertTrue(len(moved) < len(PROJECTS) / 3)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            ShardAssignment(3, 3)
+
+
+class TestShardConfig(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def test_unsharded(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(load_shard_assignment())
+
+    def test_explicit_index(self):
+        with mock.patch.dict(os.environ, {"SHARD_COUNT" : "4", "SHARD_INDEX" : "2", "POD_NAME" : "scheduler-1"}, clear=True):
+            self.assertEqual(load_shard_assignment().index, 2)
+
+    def test_pod_ordinal(self):
+        with mock.patch.dict(os.environ, {"SHARD_COUNT" : "4", "POD_NAME" : "cxone-scan-scheduler-3"}, clear=True):
+            self.assertEqual(load_shard_assignment().index, 3)
+
+    def test_hostname_ordinal(self):
+        with mock.patch.dict(os.environ, {"HOSTNAME" : "cxone-scan-scheduler-1"}, clear=True):
+            self.assertEqual(get_shard_index_config(), 1)
+
+    def test_valid_index_has_no_error(self):
+        with mock.patch.dict(os.environ, {"SHARD_COUNT" : "4", "POD_NAME" : "cxone-scan-scheduler-3"}, clear=True):
+            self.assertIsNone(get_shard_config_error())
+        with mock.patch.dict(os.environ, {"POD_NAME" : "cxone-scan-scheduler-3"}, clear=True):
+            self.assertIsNone(get_shard_config_error())
+
+    def test_pod_ordinal_out_of_range(self):
+        with mock.patch.dict(os.environ, {"SHARD_COUNT" : "4", "POD_NAME" : "cxone-scan-scheduler-4"}, clear=True):
+            error = get_shard_config_error()
+        self.assertIn("POD_NAME=cxone-scan-scheduler-4", error)
+        self.assertIn("SHARD_COUNT=4", error)
+
+    def test_explicit_index_out_of_range(self):
+        with mock.patch.dict(os.environ, {"SHARD_COUNT" : "2", "SHARD_INDEX" : "2", "HOSTNAME" : "scheduler-0"}, clear=True):
+            self.assertIn("SHARD_INDEX=2", get_shard_config_error())
+
+
+if __name__ == '__main__':
+    unittest.main()
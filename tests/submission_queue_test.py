@@ -0,0 +1,130 @@
+import unittest, asyncio, time
+from utils import PolicyRegistry
+from scan.queue import PrioritySlots, SubmissionPriority
+
+class TestPrioritySlots(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    async def __drain(self, slots, priorities):
+        order = []
+
+        async def waiter(name, priority):
+            async with slots.slot(priority):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        async with slots:
+            tasks = [asyncio.create_task(waiter(n, p)) for n, p in priorities]
+            await asyncio.sleep(0)
+            self.assertEqual(slots.depth, len(priorities))
+        await asyncio.gather(*tasks)
+        return order
+
+    async def test_priority_order(self):
+        order = await self.__drain(PrioritySlots(1), [("low", None), ("b", (1, -5.0)), ("a", (1, -10.0)), ("missed", (0, 0.0))])
+        self.assertEqual(order, ["missed", "a", "b", "low"])
+
+    async def test_fifo_without_priority(self):
+        order = await self.__drain(PrioritySlots(1), [(str(x), None) for x in range(5)])
+        self.assertEqual(order, [str(x) for x in range(5)])
+
+    async def test_limit_respected(self):
+        slots = PrioritySlots(2)
+        peak = 0
+
+        async def worker():
+            nonlocal peak
+            async with slots.slot():
+                peak = max(peak, slots.in_use)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*[worker() for _ in range(10)])
+        self.assertEqual(peak, 2)
+        self.assertEqual(slots.in_use, 0)
+        self.assertEqual(slots.depth, 0)
+
+    async def test_cancelled_waiter_releases(self):
+        slots = PrioritySlots(1)
+        await slots.acquire()
+        waiter = asyncio.create_task(slots.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        slots.release()
+        await asyncio.wait_for(slots.acquire(), 1)
+        self.assertEqual(slots.in_use, 1)
+
+
+class TestSubmissionPriority(unittest.TestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def setUp(self):
+        self.policies = PolicyRegistry({"hourly" : "0 * * * *", "daily" : "0 0 * * *"}, weights={"daily" : 2.0})
+
+    def test_never_scanned_first(self):
+        priority = SubmissionPriority(self.policies)
+        priority.succeeded("p1")
+        self.assertLess(priority.priority("p2", "0 * * * *"), priority.priority("p1", "0 * * * *"))
+
+    def test_missed_first(self):
+        priority = SubmissionPriority(self.policies)
+        priority.missed("p1")
+        self.assertLess(priority.priority("p1", "0 * * * *"), priority.priority("p2", "0 * * * *"))
+        priority.succeeded("p1")
+        self.assertLess(priority.priority("p2", "0 * * * *"), priority.priority("p1", "0 * * * *"))
+
+    def test_weight(self):
+        self.assertEqual(self.policies.weight("0 0 * * *"), 2.0)
+        self.assertEqual(self.policies.weight("0 * * * *"), 1.0)
+        priority = SubmissionPriority(self.policies)
+        priority.succeeded("p1")
+        time.sleep(0.05)
+        self.assertLess(priority.priority("p1", "0 0 * * *"), priority.priority("p1", "0 * * * *"))
+
+
+class TestQueuedPriority(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def setUp(self):
+        self.priority = SubmissionPriority(PolicyRegistry({"hourly" : "0 * * * *"}))
+        self.slots = PrioritySlots(1)
+        self.priority.watch(self.slots)
+
+    async def __queue(self, project_ids):
+        order = []
+
+        async def scan(project_id):
+            async with self.slots.slot(self.priority.priority(project_id, "0 * * * *"), project_id):
+                order.append(project_id)
+                await asyncio.sleep(0)
+
+        await self.slots.acquire()
+        tasks = []
+        for project_id in project_ids:
+            tasks.append(asyncio.create_task(scan(project_id)))
+            await asyncio.sleep(0.01)
+        return order, tasks
+
+    async def test_equal_priority_in_arrival_order(self):
+        order, tasks = await self.__queue(["a", "b", "c"])
+        self.slots.release()
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["a", "b", "c"])
+
+    async def test_missed_moves_waiting_scan_ahead(self):
+        self.priority.succeeded("c")
+        order, tasks = await self.__queue(["a", "b", "c", "d"])
+        self.priority.missed("c")
+        self.slots.release()
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["c", "a", "b", "d"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest, asyncio
+from utils import ProjectSchedule, PolicyRegistry
+from logic.dispatch import TriggerDispatcher
+
+DAILY = "0 0 * * *"
+HOURLY = "0 * * * *"
+
+def sched(pid, schedule=DAILY, branch="main"):
+    return ProjectSchedule(pid, schedule, branch, ["sast"], "https://scm/org/repo.git")
+
+
+class _Job:
+    def __init__(self, jobs, func, args):
+        self.jobs = jobs
+        self.func = func
+        self.args = args
+
+    def remove(self):
+        self.jobs.remove(self)
+
+
+class _Scheduler:
+    def __init__(self):
+        self.jobs = []
+
+    def add_job(self, func, trigger, args=None, name=None):
+        job = _Job(self.jobs, func, args)
+        self.jobs.append(job)
+        return job
+
+    async def fire(self, crontab):
+        for job in list(self.jobs):
+            if job.args == [crontab]:
+                await job.func(*job.args)
+
+
+class _Executor:
+    def __init__(self, submitted, gate):
+        self.submitted = submitted
+        self.gate = gate
+
+    async def __call__(self, sched):
+        self.submitted.append(sched)
+        await self.gate.wait()
+
+
+class TestTriggerDispatcher(unittest.IsolatedAsyncioTestCase):
+
+    def test_canary(self):
+        self.assertTrue(True)
+
+    def setUp(self):
+        self.scheduler = _Scheduler()
+        self.submitted = []
+        self.gate = asyncio.Event()
+        self.dispatcher = TriggerDispatcher(self.scheduler, PolicyRegistry({"daily" : DAILY, "hourly" : HOURLY}), 
+                                            lambda s: {"executor" : _Executor(self.submitted, self.gate), "sched" : s})
+
+    async def __drain(self):
+        self.gate.set()
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+    async def test_one_job_per_trigger(self):
+        for pid in ["a", "b", "c"]:
+            self.dispatcher.add(sched(pid))
+        self.dispatcher.add(sched("a", HOURLY))
+        self.assertEqual(len(self.scheduler.jobs), 2)
+        self.assertEqual(self.dispatcher.job_counts(), {DAILY : 3, HOURLY : 1})
+
+    async def test_fire_uses_current_index(self):
+        self.dispatcher.add(sched("a"))
+        self.dispatcher.add(sched("b"))
+        self.dispatcher.modify(sched("b"), sched("b", branch="dev"))
+        self.dispatcher.remove(sched("a"))
+
+        await self.scheduler.fire(DAILY)
+        await self.__drain()
+        self.assertEqual(self.submitted, [sched("b", branch="dev")])
+
+    async def test_last_removal_removes_job(self):
+        self.dispatcher.add(sched("a"))
+        self.dispatcher.remove_project("a", [sched("a")])
+        self.assertEqual(len(self.scheduler.jobs), 0)
+        self.assertEqual(self.dispatcher.job_counts(), {})
+
+    async def test_running_project_skipped(self):
+        self.dispatcher.add(sched("a"))
+        await self.scheduler.fire(DAILY)
+        await asyncio.sleep(0)
+        await self.scheduler.fire(DAILY)
+        await self.__drain()
+        self.assertEqual(len(self.submitted), 1)
+
+        await self.scheduler.fire(DAILY)
+        await self.__drain()
+        self.assertEqual(len(self.submitted), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
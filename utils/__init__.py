@@ -4,6 +4,12 @@ from pathlib import Path
 from cron_validator import CronValidator
 from pathlib import Path
 from cxone_api import AuthRegionEndpoints, ApiRegionEndpoints, CxOneAuthEndpoint, CxOneApiEndpoint
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.base import BaseTrigger
+from datetime import timedelta
+from hashlib import sha256
+from urllib.parse import urlparse
+from collections.abc import Mapping
 from typing import List, Dict, Union
 
 def logger():
@@ -89,7 +95,7 @@ def load_default_schedule():
         return None
 
 
-def load_policies() -> Dict:
+def load_policies() -> 'PolicyRegistry':
     default = {
         "daily" : "0 0 * * *",
         "hourly" : "0 * * * *"
@@ -122,25 +128,67 @@ def load_policies() -> Dict:
     # Allow override of daily and hourly
     merge = {k:default[k] for k in default.keys() if k not in policies.keys() }
     
-    return policies | merge
+    return PolicyRegistry(policies | merge, load_policy_spreads(), load_policy_weights())
 
 
 
 
+def parse_duration_seconds(value : str) -> Union[int, None]:
+    units = {"s" : 1, "m" : 60, "h" : 3600, "d" : 86400}
+    match = re.fullmatch(r"\s*(\d+)\s*([smhd]?)\s*", value.lower())
+    if match is None:
+        return None
+    return int(match.group(1)) * units.get(match.group(2), 1)
+
+
+def load_policy_weights() -> Dict:
+    weights = {}
+
+    for k in os.environ.keys():
+        if k.lower().startswith("weight_"):
+            policy_name = k.lower()[len("weight_"):]
+            try:
+                weight = float(os.environ[k])
+                if weight <= 0:
+                    raise ValueError()
+            except ValueError:
+                logger().error(f"Weight [{os.environ[k]}] for policy {policy_name} is invalid, skipping.")
+                continue
+
+            # Separators are equivalent in policy names.
+            weights[policy_name.replace("-", "_")] = weight
+            weights[policy_name.replace("_", "-")] = weight
+
+    return weights
+
+
+def load_policy_spreads() -> Dict:
+    spreads = {}
+
+    for k in os.environ.keys():
+        if k.lower().startswith("spread_"):
+            policy_name = k.lower()[len("spread_"):]
+            seconds = parse_duration_seconds(os.environ[k])
+            if seconds is None:
+                logger().error(f"Spread [{os.environ[k]}] for policy {policy_name} is invalid, skipping.")
+                continue
+
+            # Separators are equivalent in policy names.
+            spreads[policy_name.replace("-", "_")] = seconds
+            spreads[policy_name.replace("_", "-")] = seconds
+
+    return spreads
+
+
 class ScheduleString:
 
 
     def __init__(self, schedule, policy_dict):
-        policy_strings = [f"^{x}$" for x in policy_dict.keys()]
-        self.__validator = re.compile("|".join(policy_strings))
         self.__schedule = schedule.lower().strip("\"\'")
         self.__policies = policy_dict
 
     def is_valid(self):
-        try:
-            return not self.__validator.search(self.__schedule) is None
-        except ValueError:
-            return False
+        return self.__schedule in self.__policies.keys()
     
     def get_crontab_schedule(self):
         return self.__policies[self.__schedule]
@@ -149,6 +197,121 @@ class ScheduleString:
         return self.get_crontab_schedule()
 
 
+class SpreadTrigger(BaseTrigger):
+
+    def __init__(self, trigger : BaseTrigger, offset_seconds : int):
+        self.__trigger = trigger
+        self.__offset = timedelta(seconds=offset_seconds)
+
+    @property
+    def offset(self) -> timedelta:
+        return self.__offset
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        # Compute the fire time of the underlying trigger as if the clock were behind by the offset.
+        base = self.__trigger.get_next_fire_time(previous_fire_time - self.__offset if previous_fire_time is not None else None, 
+                                                 now - self.__offset)
+        return base + self.__offset if base is not None else None
+
+    def __str__(self):
+        return f"{self.__trigger} +{self.__offset}"
+
+
+class PolicyRegistry(Mapping):
+    __MAX_PARSED = 1024
+
+    def __init__(self, policies : Dict, spreads : Dict = None, weights : Dict = None):
+        self.__policies = dict(policies)
+        self.__parsed = {}
+        self.__triggers = {}
+        self.__spreads = {}
+        self.__weights = {}
+        self.__names = {}
+
+        for name, crontab in self.__policies.items():
+            if crontab not in self.__triggers.keys():
+                self.__triggers[crontab] = CronTrigger.from_crontab(crontab)
+                self.__names[crontab] = name
+
+        # Spreads and weights are configured by policy name but jobs only know the crontab; if policies
+        # sharing a crontab have different values, the largest one wins.
+        self.__spreads = self.__by_crontab("Spread", spreads)
+        self.__weights = self.__by_crontab("Weight", weights)
+
+    def __by_crontab(self, kind : str, values : Dict) -> Dict:
+        result = {}
+        configured = {}
+
+        for name, value in (values if values is not None else {}).items():
+            if name not in self.__policies.keys():
+                logger().error(f"{kind} defined for unknown policy [{name}], skipping.")
+                continue
+            crontab = self.__policies[name]
+            result[crontab] = max(value, result.get(crontab, 0))
+            configured.setdefault(crontab, set()).add(name.replace("-", "_"))
+
+        for crontab, names in configured.items():
+            # Separators are equivalent in policy names.
+            sharing = sorted({name.replace("-", "_") for name, policy_crontab in self.__policies.items() if policy_crontab == crontab})
+            if len(sharing) > 1:
+                logger().warning(f"{kind} {result[crontab]} set for policies {sorted(names)} applies to all policies with crontab [{crontab}]: {sharing}")
+
+        return result
+
+    def __getitem__(self, name):
+        return self.__policies[name]
+
+    def __iter__(self):
+        return iter(self.__policies)
+
+    def __len__(self):
+        return len(self.__policies)
+
+    def parse(self, schedule : str) -> ScheduleString:
+        if schedule in self.__parsed.keys():
+            return self.__parsed[schedule]
+
+        ss = ScheduleString(schedule, self.__policies)
+
+        # Tag values come from users; only a handful are expected but don't let a bad actor grow this without bound.
+        if len(self.__parsed.keys()) < PolicyRegistry.__MAX_PARSED:
+            self.__parsed[schedule] = ss
+
+        return ss
+
+    def has_crontab(self, crontab : str) -> bool:
+        return crontab in self.__triggers.keys()
+
+    def name_of(self, crontab : str) -> str:
+        return self.__names.get(crontab, crontab)
+
+    def weight(self, crontab : str) -> float:
+        return self.__weights.get(crontab, 1.0)
+
+    def spread(self, crontab : str) -> int:
+        return self.__spreads.get(crontab, 0)
+
+    def offset(self, crontab : str, project_id : str) -> int:
+        spread = self.spread(crontab)
+        if spread <= 0:
+            return 0
+        # Stable across restarts, unlike hash().
+        return int(sha256(project_id.encode()).hexdigest()[:16], 16) % spread
+
+    def trigger(self, crontab : str, project_id : str = None) -> BaseTrigger:
+        offset = self.offset(crontab, project_id) if project_id is not None else 0
+        if offset == 0:
+            return self.__triggers[crontab]
+        return SpreadTrigger(self.__triggers[crontab], offset)
+
+    @property
+    def crontabs(self) -> List[str]:
+        return list(self.__triggers.keys())
+
+    def __repr__(self):
+        return str(self.__policies)
+
+
 class ProjectSchedule:
 
     def __init__(self, project_id, schedule_string, branch, engines, repo_url):
@@ -157,6 +320,7 @@ class ProjectSchedule:
         self.__branch = branch
         self.__engines = engines
         self.__repo_url = repo_url
+        self.__key = (project_id, str(schedule_string), branch, tuple(engines) if engines is not None else None, repo_url)
 
     @property
     def project_id(self):
@@ -178,6 +342,25 @@ class ProjectSchedule:
     def repo_url(self):
         return self.__repo_url
     
+    # The scan parameters, everything except the project and the trigger.
+    @property
+    def payload(self):
+        return self.__key[2:]
+
+    def __eq__(self, other):
+        return isinstance(other, ProjectSchedule) and self.__key == other.__key
+
+    def __hash__(self):
+        return hash(self.__key)
+
+    def to_dict(self) -> Dict:
+        return {"project_id" : self.project_id, "schedule" : self.schedule, "branch" : self.branch,
+                "engines" : self.engines, "repo_url" : self.repo_url}
+
+    @staticmethod
+    def from_dict(d : Dict):
+        return ProjectSchedule(d['project_id'], d['schedule'], d['branch'], d['engines'], d['repo_url'])
+
     def __repr__(self):
         return f"{self.project_id}:{self.repo_url}:{self.branch}:{self.engines}:{self.schedule}"
     
@@ -205,6 +388,10 @@ class GroupSchedules:
         else:
             return None
         
+    @property
+    def groups(self):
+        return list(self.__index.keys())
+
     @property
     def empty(self):
         return len(self.__index.keys()) == 0
@@ -248,6 +435,186 @@ def get_proxy_config():
 def get_threads_config():
     return get_int_from_env("THREADS", 1, 2)
 
+def get_adaptive_threads():
+    if "ADAPTIVE_THREADS" in os.environ.keys():
+        return True if os.environ['ADAPTIVE_THREADS'].lower() == 'true' else False
+    else:
+        return False
+
+def get_adaptive_fetch_target_config():
+    return get_int_from_env("ADAPTIVE_FETCH_TARGET_SECONDS", 1, 120)
+
+def get_adaptive_max_queued_config():
+    return get_int_from_env("ADAPTIVE_MAX_QUEUED", 0, 0)
+
+def get_crawl_concurrency_config():
+    return get_int_from_env("CRAWL_CONCURRENCY", 1, 1)
+
+def get_crawl_page_size_config():
+    return get_int_from_env("CRAWL_PAGE_SIZE", 1, 100)
+
+def get_crawl_page_concurrency_config():
+    return get_int_from_env("CRAWL_PAGE_CONCURRENCY", 1, 1)
+
+def get_incremental_refresh():
+    if "INCREMENTAL_REFRESH" in os.environ.keys():
+        return True if os.environ['INCREMENTAL_REFRESH'].lower() == 'true' else False
+    else:
+        return False
+
+def get_full_refresh_seconds_config():
+    return get_int_from_env("FULL_REFRESH_SECONDS", 0, 86400)
+
+def get_snapshot_path():
+    if 'SNAPSHOT_PATH' in os.environ.keys() and len(os.environ['SNAPSHOT_PATH']) > 0:
+        return os.environ['SNAPSHOT_PATH']
+    else:
+        return None
+
+def get_submit_rate_config():
+    return get_int_from_env("SUBMIT_RATE_PER_MINUTE", 0, 0)
+
+def get_submit_burst_config():
+    return get_int_from_env("SUBMIT_BURST", 1, 10)
+
+def get_forecast_hours_config():
+    return get_int_from_env("FORECAST_HOURS", 1, 24)
+
+def get_forecast_limit_config():
+    return get_int_from_env("FORECAST_LIMIT", 0, get_threads_config())
+
+def get_repo_cache_seconds_config():
+    return get_int_from_env("REPO_CACHE_SECONDS", 0, 0)
+
+def get_repo_cache_size_config():
+    return get_int_from_env("REPO_CACHE_SIZE", 1, 100000)
+
+def get_recent_scan_refresh_seconds_config():
+    # Defaults to one minute for each hour of RECENT_SCAN_HOURS.
+    return get_int_from_env("RECENT_SCAN_REFRESH_SECONDS", 1, get_recent_scan_hours_config() * 60)
+
+def get_bulk_recent_scans():
+    if "BULK_RECENT_SCANS" in os.environ.keys():
+        return True if os.environ['BULK_RECENT_SCANS'].lower() == 'true' else False
+    else:
+        return False
+
+def get_dispatch_by_trigger():
+    if "DISPATCH_BY_TRIGGER" in os.environ.keys():
+        return True if os.environ['DISPATCH_BY_TRIGGER'].lower() == 'true' else False
+    else:
+        return False
+
+def get_batch_prefire_checks():
+    if "BATCH_PREFIRE_CHECKS" in os.environ.keys():
+        return True if os.environ['BATCH_PREFIRE_CHECKS'].lower() == 'true' else False
+    else:
+        return False
+
+class ShardAssignment:
+    # Rendezvous hashing: each project belongs to the shard with the highest hash of the
+    # shard index and project id.  Changing the shard count only moves the projects that
+    # belong to the added or removed shards.
+
+    def __init__(self, index : int, count : int):
+        if count < 1 or index < 0 or index >= count:
+            raise ValueError(f"Invalid shard {index} of {count}.")
+        self.__index = index
+        self.__count = count
+
+    @property
+    def index(self) -> int:
+        return self.__index
+
+    @property
+    def count(self) -> int:
+        return self.__count
+
+    def owner(self, project_id : str) -> int:
+        if self.__count == 1:
+            return 0
+        scores = [sha256(f"{shard}:{project_id}".encode()).digest()[:8] for shard in range(self.__count)]
+        return scores.index(max(scores))
+
+    def owns(self, project_id : str) -> bool:
+        return self.owner(project_id) == self.__index
+
+    def __repr__(self):
+        return f"{self.__index + 1} of {self.__count}"
+
+
+def get_shard_count_config():
+    return get_int_from_env("SHARD_COUNT", 1, 1)
+
+def get_shard_index_source():
+    # An explicit index takes precedence; otherwise use the ordinal of a StatefulSet pod name.
+    if "SHARD_INDEX" in os.environ.keys():
+        return "SHARD_INDEX"
+
+    for var in ["POD_NAME", "HOSTNAME"]:
+        if var in os.environ.keys() and re.search(r"-(\d+)$", os.environ[var]) is not None:
+            return var
+
+    return None
+
+def get_shard_index_config():
+    source = get_shard_index_source()
+    if source is None:
+        return 0
+    elif source == "SHARD_INDEX":
+        return get_int_from_env("SHARD_INDEX", 0, 0)
+    else:
+        return int(re.search(r"-(\d+)$", os.environ[source]).group(1))
+
+def get_shard_config_error() -> Union[str, None]:
+    count = get_shard_count_config()
+    index = get_shard_index_config()
+    if count <= 1 or index < count:
+        return None
+
+    source = get_shard_index_source()
+    return f"Shard index {index} from {source}={os.environ[source]} is not less than SHARD_COUNT={count}.  " + \
+        "Set SHARD_INDEX or scale the StatefulSet to no more than SHARD_COUNT replicas."
+
+def load_shard_assignment() -> Union[ShardAssignment, None]:
+    if get_shard_count_config() <= 1:
+        return None
+    return ShardAssignment(get_shard_index_config(), get_shard_count_config())
+
+
+def get_repo_host(repo_url : str) -> Union[str, None]:
+    if repo_url is None:
+        return None
+
+    if "://" in repo_url:
+        host = urlparse(repo_url).hostname
+    else:
+        # scp-like syntax: [user@]host:path
+        match = re.match(r"^(?:[^@/]+@)?([^:/]+):", repo_url)
+        host = match.group(1) if match is not None else None
+
+    return host.lower() if host is not None else None
+
+def load_scm_host_limits() -> List:
+    limits = []
+
+    for k in sorted(os.environ.keys()):
+        if k.startswith("SCM_PATTERN_"):
+            limit_key = f"SCM_LIMIT_{k[len('SCM_PATTERN_'):]}"
+            if limit_key not in os.environ.keys():
+                logger().error(f"{k} has no matching {limit_key}, skipping.")
+                continue
+
+            try:
+                limits.append((os.environ[k].lower(), max(0, int(os.environ[limit_key]))))
+            except ValueError:
+                logger().error(f"{limit_key} is not an integer, skipping.")
+
+    return limits
+
+def get_scm_default_limit_config():
+    return get_int_from_env("SCM_DEFAULT_LIMIT", 0, 0)
+
 def get_fetch_throttle():
     if "FETCH_THROTTLE" in os.environ.keys():
         return True if os.environ['FETCH_THROTTLE'].lower() == 'true' else False
@@ -257,6 +624,42 @@ def get_fetch_throttle():
 def get_fetch_timeout_config():
     return get_int_from_env("FETCH_WAIT_SECONDS", 0, 300)
 
+def get_fetch_poll_seconds_config():
+    return get_int_from_env("FETCH_POLL_SECONDS", 1, 10)
+
+def get_http_port_config():
+    return get_int_from_env("HTTP_PORT", 0, 0)
+
+def get_http_bind_config():
+    if 'HTTP_BIND' in os.environ.keys() and len(os.environ['HTTP_BIND']) > 0:
+        return os.environ['HTTP_BIND']
+    else:
+        return "0.0.0.0"
+
+def get_profile_path():
+    if 'PROFILE_PATH' in os.environ.keys() and len(os.environ['PROFILE_PATH']) > 0:
+        return os.environ['PROFILE_PATH']
+    else:
+        return None
+
+def get_profile_interval_ms_config():
+    return get_int_from_env("PROFILE_INTERVAL_MS", 1, 10)
+
+def get_loop_lag_threshold_ms_config():
+    return get_int_from_env("LOOP_LAG_THRESHOLD_MS", 10, 250)
+
+def get_refresh_endpoint():
+    if "REFRESH_ENDPOINT" in os.environ.keys():
+        return True if os.environ['REFRESH_ENDPOINT'].lower() == 'true' else False
+    else:
+        return False
+
+def get_refresh_token():
+    if 'REFRESH_TOKEN' in os.environ.keys() and len(os.environ['REFRESH_TOKEN']) > 0:
+        return os.environ['REFRESH_TOKEN']
+    else:
+        return None
+
 def get_recent_scan_hours_config():
     return get_int_from_env("RECENT_SCAN_HOURS", 0, 0)
 
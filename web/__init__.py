@@ -0,0 +1,101 @@
+import asyncio, logging
+from urllib.parse import urlsplit, parse_qs
+from typing import Awaitable, Callable, Dict, Tuple
+
+
+class HttpResponse:
+
+    def __init__(self, status : int, body : str = "", content_type : str = "text/plain; charset=utf-8"):
+        self.status = status
+        self.body = body.encode() if isinstance(body, str) else body
+        self.content_type = content_type
+
+
+class HttpServer:
+    # A minimal HTTP/1.1 server on the scheduler's event loop.  Requests are served one per
+    # connection; it is meant for scrapers and operators, not for public exposure.
+    __MAX_HEADER_LINES = 100
+    __MAX_BODY = 1024 * 1024
+    __READ_TIMEOUT = 10
+    __REASONS = {200 : "OK", 202 : "Accepted", 400 : "Bad Request", 401 : "Unauthorized", 404 : "Not Found", 405 : "Method Not Allowed", 
+                 413 : "Payload Too Large", 500 : "Internal Server Error", 503 : "Service Unavailable"}
+
+    __log = logging.getLogger("HttpServer")
+
+    def __init__(self, bind : str, port : int):
+        self.__bind = bind
+        self.__port = port
+        self.__routes = {}
+        self.__server = None
+
+    def route(self, method : str, path : str, handler : Callable[[Dict, bytes, Dict], Awaitable[HttpResponse]]) -> None:
+        self.__routes[(method.upper(), path)] = handler
+
+    async def start(self) -> None:
+        self.__server = await asyncio.start_server(self.__handle, self.__bind, self.__port)
+        HttpServer.__log.info(f"Listening on {self.__bind}:{self.port}")
+
+    @property
+    def port(self) -> int:
+        # The bound port, which differs from the configured port when it is 0.
+        if self.__server is None or len(self.__server.sockets) == 0:
+            return self.__port
+        return self.__server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self.__server is not None:
+            self.__server.close()
+            await self.__server.wait_closed()
+            self.__server = None
+
+    async def __read_request(self, reader : asyncio.StreamReader) -> Tuple[str, str, Dict, bytes]:
+        method, target, _ = (await reader.readline()).decode("latin-1").strip().split(" ", 2)
+
+        headers = {}
+        for _ in range(HttpServer.__MAX_HEADER_LINES):
+            line = (await reader.readline()).decode("latin-1").strip()
+            if len(line) == 0:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise ValueError("Too many headers.")
+
+        length = int(headers.get("content-length", "0"))
+        if length > HttpServer.__MAX_BODY:
+            raise OverflowError()
+        body = await reader.readexactly(length) if length > 0 else b""
+
+        return method.upper(), target, headers, body
+
+    async def __dispatch(self, reader : asyncio.StreamReader) -> HttpResponse:
+        try:
+            method, target, headers, body = await asyncio.wait_for(self.__read_request(reader), HttpServer.__READ_TIMEOUT)
+        except OverflowError:
+            return HttpResponse(413)
+        except (ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            return HttpResponse(400)
+
+        url = urlsplit(target)
+        handler = self.__routes.get((method, url.path), None)
+        if handler is None:
+            return HttpResponse(405 if url.path in [p for _, p in self.__routes.keys()] else 404)
+
+        try:
+            return await handler(parse_qs(url.query), body, headers)
+        except Exception as ex:
+            HttpServer.__log.exception(ex)
+            return HttpResponse(500)
+
+    async def __handle(self, reader : asyncio.StreamReader, writer : asyncio.StreamWriter) -> None:
+        try:
+            response = await self.__dispatch(reader)
+            writer.write((f"HTTP/1.1 {response.status} {HttpServer.__REASONS.get(response.status, '')}\r\n" + 
+                          f"Content-Type: {response.content_type}\r\n" + 
+                          f"Content-Length: {len(response.body)}\r\n" + 
+                          "Connection: close\r\n\r\n").encode("latin-1") + response.body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
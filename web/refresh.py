@@ -0,0 +1,65 @@
+import json, logging, hmac
+from . import HttpResponse
+from typing import Dict, List
+
+
+class ProjectRefreshHandler:
+    # Handles POST requests that name projects whose schedules should be resolved again
+    # immediately, such as from a webhook sent when a project's tags or repository change.
+    __log = logging.getLogger("ProjectRefreshHandler")
+
+    def __init__(self, token : str = None, max_projects : int = 1000):
+        self.__token = token
+        self.__max_projects = max_projects
+        self.__scheduler = None
+
+    # The scheduler is assigned once it has started; requests before then are refused.
+    @property
+    def scheduler(self):
+        return self.__scheduler
+
+    @scheduler.setter
+    def scheduler(self, value):
+        self.__scheduler = value
+
+    def __authorized(self, headers : Dict) -> bool:
+        if self.__token is None:
+            return True
+        return hmac.compare_digest(headers.get("authorization", ""), f"Bearer {self.__token}")
+
+    @staticmethod
+    def __project_ids(query : Dict, body : bytes) -> List[str]:
+        ids = list(query.get("project", []))
+
+        if len(body) > 0:
+            payload = json.loads(body)
+            projects = payload.get("projects", []) if isinstance(payload, dict) else payload
+            if not isinstance(projects, list) or not all(isinstance(p, str) for p in projects):
+                raise ValueError("Projects must be a list of project ids.")
+            ids = ids + projects
+
+        return list(dict.fromkeys(p.strip() for p in ids if len(p.strip()) > 0))
+
+    async def __call__(self, query : Dict, body : bytes, headers : Dict) -> HttpResponse:
+        if not self.__authorized(headers):
+            return HttpResponse(401)
+
+        if self.__scheduler is None:
+            return HttpResponse(503, "Scheduler is starting.")
+
+        try:
+            ids = ProjectRefreshHandler.__project_ids(query, body)
+        except ValueError as ex:
+            return HttpResponse(400, str(ex))
+
+        if len(ids) == 0:
+            return HttpResponse(400, "No projects were given.")
+        if len(ids) > self.__max_projects:
+            return HttpResponse(413, f"At most {self.__max_projects} projects may be refreshed per request.")
+
+        diff = await self.__scheduler.refresh_projects(ids)
+        ProjectRefreshHandler.__log.info(f"Refreshed {len(ids)} projects: {diff}")
+
+        return HttpResponse(200, json.dumps({"projects" : len(ids), "new" : len(diff.new),
+                                             "removed" : len(diff.removed), "changed" : len(diff.changed)}),
+                            "application/json")